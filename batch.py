@@ -0,0 +1,136 @@
+from concurrent.futures import ProcessPoolExecutor
+from parsing import load_task, compile_domain
+from solver import Solver
+from plan_output import save_plan
+import multiprocessing
+import resource
+import signal
+import argparse
+import json
+import glob
+import time
+import csv
+import os
+
+
+REPORT_FIELDS = ('domain', 'problem', 'status', 'plan_length', 'nodes', 'expansions', 'time', 'peak_memory')
+
+
+def find_instances(path):
+    """Returns the (domain, problem) pairs listed in a JSON manifest (a list of [domain, problem] pairs, relative to
+    the manifest directory), or found in a directory, where problem-XX.pddl goes with domain-XX.pddl if it exists and
+    with domain.pddl otherwise"""
+    if os.path.isfile(path):
+        root = os.path.dirname(path)
+        with open(path) as manifest:
+            pairs = json.load(manifest)
+        return [(os.path.join(root, domain), os.path.join(root, problem)) for domain, problem in pairs]
+    instances = []
+    for problem in sorted(glob.glob(os.path.join(path, 'problem*.pddl'))):
+        domain = os.path.join(path, os.path.basename(problem).replace('problem', 'domain', 1))
+        instances.append((domain if os.path.exists(domain) else os.path.join(path, 'domain.pddl'), problem))
+    return instances
+
+
+class TimeLimitExceeded(Exception):
+    """Raised in a worker when the time limit of the problem it solves is over"""
+
+
+def _time_limit_exceeded(signum, frame):
+    raise TimeLimitExceeded()
+
+
+def solve_instance(domain, problem, solve_kwargs, cache_size=None, time_limit=None, memory_limit=None,
+                   task_cache=None, plans_dir=None, compiled_domain=None):
+    """Worker side of the batch, run in a fresh process for each problem so that the memory limit and the peak memory
+    are the ones of this problem only. The solving gives up after time_limit seconds, parsing, grounding and search
+    included (through a SIGALRM timer). The compiled task is read from the task_cache directory if given, so that
+    the problem is only parsed the first time; otherwise, if compiled_domain (the parsing.Domain of the domain file)
+    is given, only the problem file is parsed. If memory_limit (in bytes) is given, the address space of the worker
+    is bounded by it and a problem running out of memory is reported as such. If plans_dir is given, the plan found
+    is written there in the IPC format, in a file named after the problem. Returns the report record of the
+    problem, peak_memory being the peak resident size of the worker"""
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    record = {'domain': domain, 'problem': problem, 'plan_length': None, 'nodes': None, 'expansions': None}
+    start, solver = time.time(), None
+    try:
+        try:
+            if time_limit is not None:
+                signal.signal(signal.SIGALRM, _time_limit_exceeded)
+                signal.setitimer(signal.ITIMER_REAL, time_limit)
+            solver = Solver(load_task(domain, problem, task_cache, compiled_domain), cache_size=cache_size)
+            record['nodes'], plan = solver.solve(**solve_kwargs)
+            if plan is not None:
+                record['status'], record['plan_length'] = 'solved', len(plan)
+                if plans_dir is not None:
+                    save_plan(solver, plan, os.path.join(plans_dir, os.path.splitext(os.path.basename(problem))[0]
+                                                         + '.plan'))
+            else:
+                record['status'] = 'no_plan'
+        finally:
+            if time_limit is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except TimeLimitExceeded:
+        record['status'] = 'timeout'
+    except MemoryError:
+        record['status'] = 'memory_out'
+    except Exception as e:
+        record['status'] = 'error: ' + repr(e)
+    if solver is not None:
+        record['expansions'] = solver.statistics.counters['expansions']
+    record['time'] = time.time() - start
+    record['peak_memory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # ru_maxrss is in KiB
+    return record
+
+
+def run_batch(instances, max_workers=None, time_limit=None, memory_limit=None, cache_size=None, task_cache=None,
+              plans_dir=None, **solve_kwargs):
+    """Solves every (domain, problem) instance in a process pool (see solve_instance for the arguments), each one in
+    a fresh worker forked from a server which has already imported the solver. Each domain file is parsed once, here,
+    and its operator schemas and constant types are sent to the workers of all its problems. Returns the report
+    records, in the order of instances"""
+    max_workers = max_workers or os.cpu_count()
+    if plans_dir is not None:
+        os.makedirs(plans_dir, exist_ok=True)
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['batch'])
+    domains = {domain: compile_domain(domain) for domain in sorted({domain for domain, _ in instances})}
+    with ProcessPoolExecutor(max_workers, mp_context=context, max_tasks_per_child=1) as executor:
+        futures = [executor.submit(solve_instance, domain, problem, solve_kwargs, cache_size, time_limit, memory_limit,
+                                   task_cache, plans_dir, domains[domain]) for domain, problem in instances]
+        return [future.result() for future in futures]
+
+
+def write_report(records, path):
+    """Writes the report records in a JSON file, or in a CSV file if path ends with .csv"""
+    with open(path, 'w', newline='') as report:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            json.dump(records, report, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves every domain/problem pair of a directory or a manifest')
+    parser.add_argument('instances', help='directory of PDDL files or JSON manifest of [domain, problem] pairs')
+    parser.add_argument('--report', default='report.json', help='report file (.json or .csv)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=None, help='seconds per problem, parsing and grounding included')
+    parser.add_argument('--memory-limit', type=int, default=None, help='megabytes per worker')
+    parser.add_argument('--heuristic', default='h_ff')
+    parser.add_argument('--search', default='gbfs')
+    parser.add_argument('--direction', default='forward')
+    parser.add_argument('--plans', default=None, help='directory where the plans are written in IPC format')
+    parser.add_argument('--task-cache', default='.task_cache', help='directory of the compiled tasks ("" for none)')
+    args = parser.parse_args()
+    batch_records = run_batch(
+        find_instances(args.instances), max_workers=args.workers, time_limit=args.time_limit,
+        memory_limit=None if args.memory_limit is None else args.memory_limit * 2 ** 20,
+        task_cache=args.task_cache or None, plans_dir=args.plans, mode=args.heuristic, search=args.search,
+        direction=args.direction
+    )
+    write_report(batch_records, args.report)
+    print(str(sum(r['status'] == 'solved' for r in batch_records)) + '/' + str(len(batch_records)) + ' solved')
@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor
+from batch import find_instances
+from parsing import parse
+from solver import Solver
+from instrumentation import Instrumentation
+import threading
+import resource
+import argparse
+import json
+import time
+import sys
+
+
+BENCHMARK_CONFIGS = (  # Keyword arguments of Solver.solve for each benchmarked configuration
+    {'mode': 'h_max'},
+    {'mode': 'h_add'},
+    {'mode': 'h_ff'},
+    {'mode': 'zero'},
+    {'mode': 'zero', 'search': 'bfs'},
+    {'mode': 'h_ff', 'search': 'gbfs'},
+    {'mode': 'h_add', 'search': 'wastar', 'weight': 2},
+    {'mode': 'h_max', 'open_list': 'bucket'},
+    {'mode': 'h_max', 'incremental': True},
+    {'mode': 'h_add', 'search': 'gbfs', 'incremental': True},
+    {'mode': 'h_add', 'search': 'gbfs', 'direction': 'bidirectional'},
+)
+
+
+def run_one(domain, problem, config, time_limit=None):
+    """Solves one instance with one configuration in the current process, profiling the successor generation, the
+    heuristic evaluations and the open list operations. Returns the benchmark record of the run"""
+    start = time.perf_counter()
+    solver = Solver(parse(domain, problem), instrumentation=Instrumentation(profile=True))
+    init_time = time.perf_counter() - start
+    stop_event = threading.Event()
+    stop_timer = threading.Timer(time_limit, stop_event.set) if time_limit is not None else None
+    try:
+        if stop_timer is not None:
+            stop_timer.start()
+        nb_nodes, plan = solver.solve(stop_event=stop_event, **config)
+    finally:
+        if stop_timer is not None:
+            stop_timer.cancel()
+    statistics = solver.statistics.to_dict()
+    return {
+        'domain': domain, 'problem': problem, 'config': config,
+        'status': 'solved' if plan is not None else 'timeout' if stop_event.is_set() else 'no_plan',
+        'plan_length': None if plan is None else len(plan), 'nodes': nb_nodes,
+        'expansions': statistics['counters']['expansions'],
+        'heuristic_calls': statistics['counters']['heuristic_calls'],
+        'heuristic_evaluations': solver.cache.misses, 'init_time': init_time,
+        'wall_time': time.perf_counter() - start, 'phase_times': statistics['phase_times'],
+        'build_times': statistics['build_times'], 'counters': statistics['counters'],
+        'caches': statistics['caches'],
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,  # ru_maxrss is in KiB
+    }
+
+
+def run_benchmark(instances, configs=BENCHMARK_CONFIGS, time_limit=None, repeat=1):
+    """Runs every configuration on every instance, each run in a fresh process so that peak RSS values do not leak
+    from one run to the other. With repeat > 1, the run with the smallest wall time is kept"""
+    records = []
+    with ProcessPoolExecutor(1, max_tasks_per_child=1) as executor:
+        for domain, problem in instances:
+            for config in configs:
+                runs = [executor.submit(run_one, domain, problem, config, time_limit).result() for _ in range(repeat)]
+                records.append(min(runs, key=lambda run: run['wall_time']))
+                print(format_record(records[-1]))
+    return records
+
+
+def format_record(record):
+    return '{} {}: {} in {:.3f}s, {} expansions, {} heuristic calls'.format(
+        record['problem'], record['config'], record['status'], record['wall_time'], record['expansions'],
+        record['heuristic_calls']
+    )
+
+
+def compare(records, baseline, threshold=0.1, min_delta=0.05):
+    """Returns the runs no longer solved, or slower (by more than the relative threshold and min_delta seconds) or
+    expanding more nodes (by more than the relative threshold) than in the baseline records, as (record, baseline
+    record) pairs. Runs which did not solve in the baseline are not checked"""
+    key = lambda record: (record['domain'], record['problem'], json.dumps(record['config'], sort_keys=True))
+    baseline = {key(record): record for record in baseline}
+    regressions = []
+    for record in records:
+        reference = baseline.get(key(record))
+        if reference is None:
+            continue
+        solved = reference['status'] == 'solved'
+        if any((solved and record['status'] != 'solved',
+                solved and record['wall_time'] > max((1 + threshold) * reference['wall_time'],
+                                                     reference['wall_time'] + min_delta),
+                solved and record['expansions'] > (1 + threshold) * reference['expansions'])):
+            regressions.append((record, reference))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the solver modes on a directory of PDDL instances')
+    parser.add_argument('instances', nargs='?', default='examples-pddl', help='directory or JSON manifest')
+    parser.add_argument('--output', default='benchmark.json', help='file where the results are saved')
+    parser.add_argument('--baseline', default=None, help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown counted as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='seconds of slowdown ignored as noise')
+    parser.add_argument('--time-limit', type=float, default=60, help='seconds of search per run')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per instance and mode, the fastest is kept')
+    parser.add_argument('--configs', default=None,
+                        help='JSON file of the configurations to run, a list of Solver.solve keyword arguments')
+    args = parser.parse_args()
+    configs = BENCHMARK_CONFIGS
+    if args.configs is not None:
+        with open(args.configs) as configs_file:
+            configs = json.load(configs_file)
+    results = run_benchmark(find_instances(args.instances), configs, time_limit=args.time_limit, repeat=args.repeat)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            found = compare(results, json.load(baseline_file), args.threshold, args.min_delta)
+        for run, base in found:
+            print('REGRESSION ' + format_record(run) + ' (baseline: ' + format_record(base) + ')')
+        sys.exit(1 if len(found) > 0 else 0)
@@ -1,5 +1,28 @@
 cfg = {
     'domain': './other_examples/domaine.pddl',
     'problem': './other_examples/probleme2.pddl',
-    'heuristic': 'h_max',  # CHOICES are "h_max", "h_plus" and "zero"
+    'heuristic': 'h_max',  # CHOICES are "h_max", "h_add" (or "h_plus"), "h_ff" and "zero"
+    'search': 'astar',  # CHOICES are "astar", "wastar" (with weight), "gbfs" and "bfs"
+    'direction': 'forward',  # CHOICES are "forward", "backward" (regression from the goals) and "bidirectional"
+    # (keep "forward" unless the goals only involve a few atoms while many actions apply initially, see README)
+    'weight': 1,  # Weight of the heuristic for "wastar" (non integer weights need the "heap" open list)
+    'heuristic_cache_size': 100000,  # Number of heuristic values kept in the LRU cache (None for no bound, 0 for none)
+    'open_list': 'heap',  # CHOICES are "heap" and "bucket" (integer f values only)
+    'tie_breaking': 'low_g',  # CHOICES are "low_g", "high_g", "fifo" and "lifo"
+    'incremental': False,  # Updates h_max and h_add values from the parent exploration instead of recomputing them
+    'table_cache_size': 1000,  # Number of exploration tables kept for the incremental evaluation of the expansions
+    'max_states': None,  # Maximal number of search nodes kept in memory (None for no bound)
+    'memory_policy': 'spill',  # CHOICES are "spill" (closed nodes go to disk) and "sma" (forgets worst leaves)
+    'anytime': False,  # Improves the plan with the searches of solver.ANYTIME_SCHEDULE instead of the search above
+    'time_limit': None,  # Seconds given to the anytime search (None for no limit)
+    'max_expansions': None,  # Number of expansions given to the anytime search (None for no limit)
+    'portfolio': False,  # Runs the configurations of portfolio.PORTFOLIO in parallel instead of the ones above
+    'portfolio_first': True,  # Keeps the first plan found, else the shortest one found before the deadline
+    'portfolio_deadline': None,  # Seconds given to the portfolio (None for no limit)
+    'workers': None,  # Number of worker processes (None for the number of cores)
+    'profile': False,  # Times successor generation, heuristic evaluations and open list operations during the search
+    'progress_interval': None,  # Seconds between two progress events written as JSON lines on stderr (None for none)
+    'plan_output': None,  # File where the plan is written, as JSON Lines if it ends with .jsonl, else in IPC format
+    'statistics': None,  # File where the statistics of the search are written as JSON (None for no file)
+    'task_cache': '.task_cache',  # Directory of the compiled tasks, keyed by content hash (None to always parse)
 }
\ No newline at end of file
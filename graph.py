@@ -1,46 +1,86 @@
-import networkx as nx
-from utils import add_to_sets_dict
-import itertools as itt
+from states import iter_ids
+from array import array
 
 
-class GraphManager:
-    """Additional structure to handle layered graphs"""
-    def __init__(self):
-        self.graph = nx.DiGraph()
-        self.node_labels = []  # id to label
-        self.nodes_indices = {}  # label to id with said label
-        self.count = 0
-        self.layers = []
+class RelaxedPlanningGraph:
+    """Relaxed planning graph of the ground actions from the initial state, stored as flat integer arrays instead of
+    one graph node per (layer, label) pair. Preconditions and positive effects of the actions are kept in CSR form
+    (action a reads pre_atoms[pre_offsets[a]:pre_offsets[a + 1]]), and each atom and action gets its level of first
+    appearance (-1 if never reached). The graph is built in a single pass over the actions, each of them being
+    triggered when its last precondition is reached, so it costs O(number of atoms + size of the actions)"""
+    def __init__(self, grounding, initial_state, goal_state):
+        self.atoms, self.actions = grounding.atoms, grounding.actions
+        self.pre_offsets, self.pre_atoms = self._csr(grounding.pre_pos)
+        self.effect_offsets, self.effect_atoms = self._csr(grounding.effect_pos)
+        self.fact_level = array('i', [-1] * len(self.atoms))
+        self.action_level = array('i', [-1] * len(self.actions))
+        self.fact_layers, self.action_layers = self._expand(grounding.encode(initial_state))
+        goal_levels = [self.fact_level[i] for i in iter_ids(grounding.encode(goal_state))]
+        # Level at which all goals first hold, None if one of them is never reached
+        self.goal_level = None if -1 in goal_levels else max(goal_levels, default=0)
 
-    def add_nodes(self, nodes_labels):
-        """Adds specified nodes into the graph and updates pointers structures"""
-        nodes_labels = list(nodes_labels)
-        nodes_indices = [i + self.count for i in range(len(nodes_labels))]
-        self.node_labels.extend(nodes_labels)
-        [add_to_sets_dict(self.nodes_indices, *lab_and_n) for lab_and_n in zip(nodes_labels, nodes_indices)]
-        self.graph.add_nodes_from(nodes_indices)
-        self.count += len(nodes_labels)
-        return nodes_indices
+    @staticmethod
+    def _csr(bitsets):
+        """Returns the (offsets, atom ids) arrays of a list of atoms bitsets"""
+        offsets, atom_ids = array('i', [0]), array('i')
+        for bits in bitsets:
+            atom_ids.extend(iter_ids(bits))
+            offsets.append(len(atom_ids))
+        return offsets, atom_ids
 
-    def add_layer(self, nodes_labels, connection_func=None, inter_connection_func=None, layer_params=None):
-        """Adds a new layer to the graph structure, connected to the last one. If specified, connection_func is a
-        2-arguments function of type (prev_layer_node_label, current_layer_node_label) -> True if they must be connected
-        The inter_connection_func is a similar function for nodes inside current layer. If specified, layer_params is
-        a dictionary of complementary attributes for the current layer"""
-        nodes_indices, edges = self.add_nodes(nodes_labels), []
-        if len(self.layers) > 0 and connection_func is not None:
-            edges += [(i1, i2) for i1, i2 in itt.product(self.layers[-1]["nodes"], nodes_indices)
-                      if connection_func(self.node_labels[i1], self.node_labels[i2])]
-        if inter_connection_func is not None:
-            edges += [(i1, i2) for i1, i2 in itt.permutations(nodes_indices, r=2)
-                      if inter_connection_func(self.node_labels[i1], self.node_labels[i2])]
-        self.layers.append({"nodes": nodes_indices, "nb": len(self.layers), **layer_params})
-        self.graph.add_edges_from(edges)
+    def preconditions(self, action):
+        return self.pre_atoms[self.pre_offsets[action]:self.pre_offsets[action + 1]]
 
-    def get_nodes(self, ids):
-        """Returns nodes labels for specified indices"""
-        return [self.node_labels[i] for i in ids]
+    def effects(self, action):
+        return self.effect_atoms[self.effect_offsets[action]:self.effect_offsets[action + 1]]
 
-    def get_layer(self, i):
-        """Returns the i-th layer"""
-        return self.layers[i]
+    def _expand(self, initial_bits):
+        """Fills the levels of first appearance layer by layer, until no new atom is reached. Returns the atom ids of
+        each fact layer and the action indices of each action layer (actions of layer i need facts of layers <= i)"""
+        consumers = [[] for _ in range(len(self.atoms))]  # atom id -> actions needing it
+        for a in range(len(self.actions)):
+            [consumers[i].append(a) for i in self.preconditions(a)]
+        counters = [self.pre_offsets[a + 1] - self.pre_offsets[a] for a in range(len(self.actions))]
+        fact_layers, action_layers = [list(iter_ids(initial_bits))], []
+        new_actions = [a for a, nb in enumerate(counters) if nb == 0]
+        for i in fact_layers[0]:
+            self.fact_level[i] = 0
+        while True:
+            level = len(action_layers)
+            for i in fact_layers[-1]:
+                for a in consumers[i]:
+                    counters[a] -= 1
+                    if counters[a] == 0:
+                        new_actions.append(a)
+            for a in new_actions:
+                self.action_level[a] = level
+            new_facts = []
+            for a in new_actions:
+                for i in self.effects(a):
+                    if self.fact_level[i] == -1:
+                        self.fact_level[i] = level + 1
+                        new_facts.append(i)
+            if not new_facts:
+                if new_actions:
+                    action_layers.append(new_actions)
+                return fact_layers, action_layers
+            action_layers.append(new_actions)
+            fact_layers.append(new_facts)
+            new_actions = []
+
+    def to_networkx(self):
+        """Exports the graph as a networkx DiGraph, for visualization only. Nodes are ("fact", atom id) and ("action",
+        action index) pairs with "label" and "level" attributes, edges go from preconditions to actions and from
+        actions to their positive effects. Only reached atoms and actions are exported"""
+        import networkx as nx  # Optional dependency
+        graph = nx.DiGraph()
+        for i, level in enumerate(self.fact_level):
+            if level != -1:
+                graph.add_node(('fact', i), label=self.atoms.atoms[i], level=level)
+        for a, level in enumerate(self.action_level):
+            if level != -1:
+                graph.add_node(('action', a), label=(self.actions[a]['name'], *self.actions[a]['vars'].values()),
+                               level=level)
+                graph.add_edges_from((('fact', i), ('action', a)) for i in self.preconditions(a))
+                graph.add_edges_from((('action', a), ('fact', i)) for i in self.effects(a))
+        return graph
@@ -0,0 +1,198 @@
+from states import AtomTable, iter_ids, includes
+import functools as fct
+
+
+class GroundActions:
+    """Enumerates once and for all every ground action reachable from the initial state (in the relaxation ignoring
+    negative effects and negative preconditions), and stores their preconditions and effects as bitsets. Unless
+    prune is False, the actions and atoms which can not matter are then removed (see _prune): the bitsets, and so the
+    states of the search, only hold the atoms of self.mask (encode restricts a set of atoms to them)"""
+    def __init__(self, operators_manager, initial_state, goal_state, prune=True):
+        self.actions, reached = self._ground(operators_manager, initial_state)
+        self.atoms = AtomTable(reached | goal_state)
+        self.pre_pos = [self.atoms.encode(action['precond_pos']) for action in self.actions]
+        self.pre_neg = [self.atoms.encode(action['precond_neg']) for action in self.actions]
+        self.effect_pos = [self.atoms.encode(action['effect_pos']) for action in self.actions]
+        self.effect_neg = [self.atoms.encode(action['effect_neg']) for action in self.actions]
+        self.mask = (1 << len(self.atoms)) - 1
+        self.pruning = {'actions': [len(self.actions)] * 2, 'atoms': [len(self.atoms)] * 2, 'static_predicates': []}
+        if prune:
+            self._prune(self.atoms.encode(initial_state), self.atoms.encode(goal_state))
+        self.successor_generator = SuccessorGenerator(self.pre_pos, self.pre_neg)
+
+    def encode(self, atoms):
+        """Returns the bitset of a set of atoms, restricted to the atoms kept in the states of the search"""
+        return self.atoms.encode(atoms) & self.mask
+
+    def _prune(self, initial_state, goal_state):
+        """Removes the actions which can never be applied or never help reaching the goals, and compiles away the
+        atoms which do not matter, until nothing changes:
+        - static atoms (neither added nor deleted by any action) keep their initial value, so the actions needing a
+          false one or forbidding a true one are removed, and they are dropped from the preconditions and states
+        - an atom is relevant if it is a goal or a precondition of a relevant action, an action is relevant if it adds
+          a relevant atom or deletes one forbidden by a relevant action. Other actions and atoms are removed
+        Static predicates (whose atoms are all static) are listed in self.pruning, along with the numbers of actions
+        and atoms before and after pruning"""
+        kept, all_atoms = list(range(len(self.actions))), self.mask
+        touched = fct.reduce(lambda b1, b2: b1 | b2, self.effect_pos + self.effect_neg, 0)
+        touched_predicates = {self.atoms.atoms[i][0] for i in iter_ids(touched)}
+        self.pruning['static_predicates'] = sorted({atom[0] for atom in self.atoms.atoms} - touched_predicates)
+        while True:
+            touched = fct.reduce(lambda b1, b2: b1 | b2, [self.effect_pos[a] | self.effect_neg[a] for a in kept], 0)
+            static_true, static_false = initial_state & ~touched, all_atoms & ~initial_state & ~touched
+            applicable = [a for a in kept if not self.pre_pos[a] & static_false and not self.pre_neg[a] & static_true]
+            adders, deleters = {}, {}  # atom id -> applicable actions adding / deleting it
+            for a in applicable:
+                [adders.setdefault(i, []).append(a) for i in iter_ids(self.effect_pos[a])]
+                [deleters.setdefault(i, []).append(a) for i in iter_ids(self.effect_neg[a])]
+            relevant, relevant_pos, relevant_neg = set(), goal_state, 0
+            stack = [(i, True) for i in iter_ids(goal_state)]
+            while stack:
+                i, positive = stack.pop()
+                for a in (adders if positive else deleters).get(i, ()):
+                    if a not in relevant:
+                        relevant.add(a)
+                        stack.extend((j, True) for j in iter_ids(self.pre_pos[a] & ~relevant_pos))
+                        stack.extend((j, False) for j in iter_ids(self.pre_neg[a] & ~relevant_neg))
+                        relevant_pos, relevant_neg = relevant_pos | self.pre_pos[a], relevant_neg | self.pre_neg[a]
+            if len(relevant) == len(kept):
+                break
+            kept = sorted(relevant)
+        # Static false goals are kept, so that the task is still seen as unsolvable
+        self.mask = (relevant_pos | relevant_neg) & (touched | goal_state) & ~static_true
+        self.actions = [self.actions[a] for a in kept]
+        for bitsets in ('pre_pos', 'pre_neg', 'effect_pos', 'effect_neg'):
+            setattr(self, bitsets, [getattr(self, bitsets)[a] & self.mask for a in kept])
+        self.pruning['actions'][1], self.pruning['atoms'][1] = len(self.actions), bin(self.mask).count('1')
+
+    @staticmethod
+    def _ground(operators_manager, initial_state):
+        """Runs the relaxed reachability fixpoint, binding operators variables once per layer. Returns the reachable
+        actions sorted by layer of first appearance and the reachable atoms"""
+        actions, reached, known = [], frozenset(initial_state), set()
+        while True:
+            new_actions = sorted(
+                [action for action in operators_manager.get_applicable_actions(reached, relaxed=True)
+                 if action not in known],
+                key=lambda action: (action['name'], tuple(sorted(action['vars'].items())))
+            )
+            known.update(new_actions)
+            actions.extend(new_actions)
+            new_reached = fct.reduce(lambda s1, s2: s1 | s2, [action['effect_pos'] for action in new_actions], reached)
+            if new_reached == reached:
+                # No new statement, so no new action can be found
+                return actions, reached
+            reached = new_reached
+
+    def applicable(self, state):
+        """Returns the indices of the actions applicable in the state bitset"""
+        return self.successor_generator.applicable(state)
+
+    def apply(self, state, action_index):
+        """Returns the bitset of the state obtained by applying specified action in specified state"""
+        return (state & ~self.effect_neg[action_index]) | self.effect_pos[action_index]
+
+
+class SuccessorGenerator:
+    """Prefix tree over the positive preconditions of the ground actions, each sorted by atom id. A node holds the
+    actions whose preconditions have all been tested on its path, and one child per next precondition atom. Only the
+    children whose atom holds in the state are visited, so the cost of a query depends on the number of applicable
+    actions (and of partially matching prefixes), not on the total number of ground actions"""
+    def __init__(self, pre_pos, pre_neg):
+        self.pre_neg = pre_neg
+        self.root = self._build([list(iter_ids(pre)) for pre in pre_pos])
+
+    @staticmethod
+    def _build(preconditions):
+        """Builds the tree, nodes being ([actions indices], {atom bit: child node}) tuples"""
+        root = ([], {})
+        for i, precondition in enumerate(preconditions):
+            node = root
+            for atom_id in precondition:
+                node = node[1].setdefault(1 << atom_id, ([], {}))
+            node[0].append(i)
+        return root
+
+    def applicable(self, state):
+        """Returns the indices of the actions whose positive preconditions hold in the state bitset and whose negative
+        preconditions do not"""
+        applicable, stack = [], [self.root]
+        while stack:
+            actions, children = stack.pop()
+            applicable.extend(i for i in actions if not state & self.pre_neg[i])
+            stack.extend(child for atom_bit, child in children.items() if state & atom_bit)
+        return applicable
+
+
+class Regression:
+    """Regression (backward) search space over the ground actions. A node is a subgoal: the atoms which must hold
+    (pos) and the ones which must not (neg), stored in a single bitset, neg atoms being shifted by the number of atoms.
+    An action is relevant for a subgoal if it achieves one of its atoms (adds a pos one or deletes a neg one) and
+    contradicts none of them, and regressing the subgoal through it gives ((pos - effect_pos) | pre_pos,
+    (neg - effect_neg) | pre_neg). This is the partial state counterpart of the backward operator cells, which need
+    complete states"""
+    def __init__(self, grounding, initial_state, goal_state):
+        self.grounding, self.shift = grounding, len(grounding.atoms)
+        self.mask = (1 << self.shift) - 1
+        self.initial_state, self.root = grounding.encode(initial_state), grounding.encode(goal_state)
+        self.adders = [[] for _ in range(self.shift)]  # atom id -> actions adding it
+        self.deleters = [[] for _ in range(self.shift)]  # atom id -> actions deleting it
+        for a, (effect_pos, effect_neg) in enumerate(zip(grounding.effect_pos, grounding.effect_neg)):
+            [self.adders[i].append(a) for i in iter_ids(effect_pos)]
+            [self.deleters[i].append(a) for i in iter_ids(effect_neg)]
+        self.mutexes = None  # atom id -> bitset of the atoms which never hold with it, computed on first use
+
+    def compute_mutexes(self):
+        """Computes the pairs of atoms which can never hold together (h^2 reachability from the initial state, on the
+        bitsets of the atoms reachable with each atom, negative preconditions being ignored). A pair is reachable if
+        it holds initially, or if an action whose preconditions are pairwise reachable adds both atoms, or adds one
+        of them and leaves the other one (which must be pairwise reachable with the preconditions) untouched"""
+        g, pairs, changed = self.grounding, [0] * self.shift, True
+        for i in iter_ids(self.initial_state):
+            pairs[i] = self.initial_state
+        while changed:
+            changed, reached = False, sum(1 << i for i in range(self.shift) if pairs[i])
+            for pre, effect_pos, effect_neg in zip(g.pre_pos, g.effect_pos, g.effect_neg):
+                common = reached
+                for i in iter_ids(pre):
+                    common &= pairs[i]
+                if not includes(common, pre):
+                    continue  # The preconditions are not pairwise reachable
+                persisting = common & ~effect_neg & ~effect_pos
+                for i in iter_ids(effect_pos):
+                    new_pairs = (pairs[i] | effect_pos | persisting) & ~pairs[i]
+                    if new_pairs:
+                        pairs[i] |= new_pairs
+                        for j in iter_ids(new_pairs):
+                            pairs[j] |= 1 << i
+                        changed = True
+        reached = sum(1 << i for i in range(self.shift) if pairs[i])
+        self.mutexes = [reached & ~pairs[i] if pairs[i] else 0 for i in range(self.shift)]
+
+    def split(self, subgoal):
+        """Returns the (pos, neg) bitsets of a subgoal"""
+        return subgoal & self.mask, subgoal >> self.shift
+
+    def satisfied(self, subgoal, state=None):
+        """Returns True if the state bitset (the initial state by default) satisfies the subgoal"""
+        pos, neg = self.split(subgoal)
+        state = self.initial_state if state is None else state
+        return includes(state, pos) and not state & neg
+
+    def successors(self, subgoal):
+        """Returns the (action index, regressed subgoal) pairs of the actions relevant for the subgoal, subgoals holding
+        two mutually exclusive atoms (see compute_mutexes) being pruned"""
+        if self.mutexes is None:
+            self.compute_mutexes()
+        g = self.grounding
+        pos, neg = self.split(subgoal)
+        relevant = {a for i in iter_ids(pos) for a in self.adders[i]} | \
+            {a for i in iter_ids(neg) for a in self.deleters[i]}
+        successors = []
+        for a in sorted(relevant):
+            if g.effect_neg[a] & pos or g.effect_pos[a] & neg:
+                continue
+            new_pos, new_neg = (pos & ~g.effect_pos[a]) | g.pre_pos[a], (neg & ~g.effect_neg[a]) | g.pre_neg[a]
+            if not new_pos & new_neg and not any(self.mutexes[i] & new_pos for i in iter_ids(new_pos)):
+                successors.append((a, new_pos | (new_neg << self.shift)))
+        return successors
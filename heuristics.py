@@ -0,0 +1,215 @@
+from states import iter_ids
+import heapq
+
+
+HEURISTICS = ('h_max', 'h_add', 'h_plus', 'h_ff', 'zero')  # h_plus is the former name of h_add
+INCREMENTAL_HEURISTICS = ('h_max', 'h_add', 'h_plus')
+ADMISSIBLE_HEURISTICS = ('h_max', 'zero')  # Never overestimating the length of the shortest plan
+INFINITY = float('inf')
+
+
+class RelaxedExploration:
+    """Computes delete-relaxation heuristics on flat lists built once from the ground actions: precondition counts,
+    precondition and positive effect ids of each action, and consumer actions of each atom. All of them share the same
+    generalized Dijkstra kernel, which uses a bucket queue as every action costs 1. The h_max and h_add values of a
+    state can also be obtained by updating the complete exploration table of a parent state, as long as the update
+    does not invalidate more than max_update_ratio of the atoms. As in some domains nearly every update gives up (when
+    deleted atoms support most of the others), updates are only tried while they mostly succeed (see worth_updating)"""
+    def __init__(self, grounding, goal_state, max_update_ratio=0.25):
+        nb_atoms = len(grounding.atoms)
+        self.nb_atoms = nb_atoms
+        self.preconditions = [list(iter_ids(pre)) for pre in grounding.pre_pos]
+        self.effects = [list(iter_ids(effect)) for effect in grounding.effect_pos]
+        self.nb_preconditions = [len(pre) for pre in self.preconditions]
+        self.no_precondition_actions = [a for a, nb in enumerate(self.nb_preconditions) if nb == 0]
+        self.consumers = [[] for _ in range(nb_atoms)]  # atom id -> actions needing it
+        self.achievers = [[] for _ in range(nb_atoms)]  # atom id -> actions producing it
+        for a, (pre, effect) in enumerate(zip(self.preconditions, self.effects)):
+            [self.consumers[i].append(a) for i in pre]
+            [self.achievers[i].append(a) for i in effect]
+        self.goals = list(iter_ids(grounding.encode(goal_state)))
+        self.max_update_ratio = max_update_ratio
+        self.nb_updates, self.nb_give_ups = 0, 0
+
+    def explore(self, state, additive=False, complete=False):
+        """Runs the relaxed exploration from the state bitset until every goal atom (every atom if complete) has its
+        final cost. Returns the atoms costs (max or sum of the preconditions costs, plus 1, of their cheapest
+        achiever), their best supporters and the actions costs"""
+        costs, supporters = [INFINITY] * self.nb_atoms, [None] * self.nb_atoms
+        action_costs = [INFINITY] * len(self.nb_preconditions)
+        counters, pre_sums = list(self.nb_preconditions), [0] * len(self.nb_preconditions)
+        buckets = [list(iter_ids(state))]
+        for i in buckets[0]:
+            costs[i] = 0
+        for a in self.no_precondition_actions:
+            self._relax(a, 1, costs, supporters, action_costs, buckets)
+        goals_left, cost = {i for i in self.goals if costs[i] != 0}, 0
+        while (complete or goals_left) and cost < len(buckets):
+            for i in buckets[cost]:
+                if costs[i] != cost:
+                    continue  # Stale entry, the atom has been reached for cheaper since
+                goals_left.discard(i)
+                for a in self.consumers[i]:
+                    counters[a] -= 1
+                    pre_sums[a] += cost
+                    if counters[a] == 0:
+                        self._relax(a, 1 + (pre_sums[a] if additive else cost), costs, supporters, action_costs,
+                                    buckets)
+            cost += 1
+        return costs, supporters, action_costs
+
+    def _relax(self, action, action_cost, costs, supporters, action_costs, buckets):
+        """Lowers the costs of the positive effects of an action if it reaches them for cheaper"""
+        action_costs[action] = action_cost
+        for i in self.effects[action]:
+            if action_cost < costs[i]:
+                costs[i], supporters[i] = action_cost, action
+                buckets.extend([] for _ in range(action_cost + 1 - len(buckets)))
+                buckets[action_cost].append(i)
+
+    def _action_cost(self, action, costs, additive):
+        """Cost of an action given the costs of its preconditions"""
+        pre_costs = [costs[i] for i in self.preconditions[action]]
+        return 1 + (sum(pre_costs) if additive else max(pre_costs, default=0))
+
+    def update(self, table, parent_state, state, additive=False):
+        """Returns the complete exploration table of the state bitset, computed from the complete table of the parent
+        state. The costs depending on deleted atoms (through best supporters) are invalidated and recomputed first,
+        then the decrease of costs due to added atoms is propagated, both in a Dijkstra order. Returns None if too
+        many atoms would have to be recomputed, a full exploration being cheaper then"""
+        costs, supporters, action_costs = table
+        self.nb_updates += 1
+        invalid_atoms, invalid_actions = set(iter_ids(parent_state & ~state)), set()
+        stack = list(invalid_atoms)
+        while stack:
+            for a in self.consumers[stack.pop()]:
+                if a not in invalid_actions and action_costs[a] != INFINITY:
+                    invalid_actions.add(a)
+                    new_invalid_atoms = [i for i in self.effects[a] if supporters[i] == a and i not in invalid_atoms]
+                    invalid_atoms.update(new_invalid_atoms)
+                    stack.extend(new_invalid_atoms)
+            if len(invalid_atoms) > self.max_update_ratio * self.nb_atoms:
+                self.nb_give_ups += 1
+                return None
+        costs, supporters, action_costs = list(costs), list(supporters), list(action_costs)
+
+        # Increase phase: recomputes invalidated atoms from their valid achievers, then from invalidated actions once
+        # all their invalidated preconditions have their new cost
+        for a in invalid_actions:
+            action_costs[a] = INFINITY
+        counters, heap = {a: sum(i in invalid_atoms for i in self.preconditions[a]) for a in invalid_actions}, []
+        for i in invalid_atoms:
+            costs[i], supporters[i] = INFINITY, None
+            for a in self.achievers[i]:
+                if action_costs[a] < costs[i]:
+                    costs[i], supporters[i] = action_costs[a], a
+            if costs[i] != INFINITY:
+                heapq.heappush(heap, (costs[i], i))
+        while heap:
+            cost, i = heapq.heappop(heap)
+            if costs[i] != cost:
+                continue
+            for a in self.consumers[i]:
+                if a in counters:
+                    counters[a] -= 1
+                    if counters[a] == 0:
+                        self._update_action(a, self._action_cost(a, costs, additive), costs, supporters, action_costs,
+                                            heap)
+
+        # Decrease phase: added atoms get a null cost, which can only lower the costs of their consumers
+        for i in iter_ids(state & ~parent_state):
+            if costs[i] != 0:
+                costs[i], supporters[i] = 0, None
+                heapq.heappush(heap, (0, i))
+        while heap:
+            cost, i = heapq.heappop(heap)
+            if costs[i] != cost:
+                continue
+            for a in self.consumers[i]:
+                self._update_action(a, self._action_cost(a, costs, additive), costs, supporters, action_costs, heap)
+        return costs, supporters, action_costs
+
+    def worth_updating(self, min_updates=64, max_give_up_ratio=0.5):
+        """Returns False once min_updates have been tried and more than max_give_up_ratio of them gave up, evaluating
+        the states from scratch being cheaper than the tables and the failed updates then"""
+        return self.nb_updates < min_updates or self.nb_give_ups <= max_give_up_ratio * self.nb_updates
+
+    def _update_action(self, action, action_cost, costs, supporters, action_costs, heap):
+        """Heap version of _relax, which only applies if the action cost decreases"""
+        if action_cost < action_costs[action]:
+            action_costs[action] = action_cost
+            for i in self.effects[action]:
+                if action_cost < costs[i]:
+                    costs[i], supporters[i] = action_cost, action
+                    heapq.heappush(heap, (action_cost, i))
+
+    def h_max(self, state):
+        costs, _, _ = self.explore(state)
+        return max([costs[i] for i in self.goals], default=0)
+
+    def h_add(self, state):
+        costs, _, _ = self.explore(state, additive=True)
+        return sum([costs[i] for i in self.goals])
+
+    def h_ff(self, state):
+        """Number of actions of the relaxed plan extracted from the h_add best supporters"""
+        costs, supporters, _ = self.explore(state, additive=True)
+        return self.relaxed_plan_size(costs, supporters, self.goals)
+
+    def relaxed_plan_size(self, costs, supporters, goals):
+        """Number of actions of the relaxed plan reaching the goals atoms ids, extracted from the best supporters of an
+        additive exploration"""
+        if any(costs[i] == INFINITY for i in goals):
+            return INFINITY
+        plan, open_atoms = set(), [i for i in goals if costs[i] > 0]
+        while open_atoms:
+            action = supporters[open_atoms.pop()]
+            if action not in plan:
+                plan.add(action)
+                open_atoms.extend(i for i in self.preconditions[action] if costs[i] > 0)
+        return len(plan)
+
+    def table(self, state, mode='h_max'):
+        """Returns the complete exploration table of the state bitset for an incremental heuristic"""
+        assert mode in INCREMENTAL_HEURISTICS
+        return self.explore(state, additive=mode != 'h_max', complete=True)
+
+    def evaluate_incremental(self, parent_state, parent_table, state, mode='h_max'):
+        """Returns the value of an incremental heuristic for the state bitset by updating the table of its parent,
+        along with the complete table of the state, to be reused when the state is expanded (it is computed from
+        scratch if the update gives up, see update)"""
+        assert mode in INCREMENTAL_HEURISTICS
+        table = self.update(parent_table, parent_state, state, additive=mode != 'h_max')
+        if table is None:
+            table = self.table(state, mode)
+        goal_costs = [table[0][i] for i in self.goals]
+        return max(goal_costs, default=0) if mode == 'h_max' else sum(goal_costs), table
+
+    def evaluate(self, state, mode='h_max'):
+        """Returns the value of specified heuristic for the state bitset (infinity if the goal is unreachable)"""
+        assert mode in HEURISTICS
+        if mode == 'zero':
+            return 0
+        return {'h_max': self.h_max, 'h_add': self.h_add, 'h_plus': self.h_add, 'h_ff': self.h_ff}[mode](state)
+
+
+class RegressionHeuristic:
+    """HSP-r style heuristics for the regression search: the relaxed exploration is run once, completely, from the
+    initial state, and the value of a subgoal is then read from the atoms costs (max or sum of the costs of its atoms,
+    or size of the relaxed plan of its atoms for h_ff), so that no exploration is needed per search node. The negative
+    part of a subgoal is ignored, as in the forward heuristics"""
+    def __init__(self, exploration, initial_state):
+        self.exploration = exploration
+        self.max_costs, _, _ = exploration.explore(initial_state, complete=True)
+        self.add_costs, self.supporters, _ = exploration.explore(initial_state, additive=True, complete=True)
+
+    def evaluate(self, atoms_ids, mode='h_max'):
+        """Returns the value of specified heuristic for the subgoal given by the ids of its atoms"""
+        assert mode in HEURISTICS
+        if mode == 'zero':
+            return 0
+        if mode == 'h_max':
+            return max([self.max_costs[i] for i in atoms_ids], default=0)
+        if mode == 'h_ff':
+            return self.exploration.relaxed_plan_size(self.add_costs, self.supporters, atoms_ids)
+        return sum([self.add_costs[i] for i in atoms_ids])
@@ -0,0 +1,82 @@
+import json
+import time
+
+
+COUNTERS = ('expansions', 'generations', 'duplicates', 'reopenings', 'dead_ends', 'heuristic_calls', 'forgotten')
+PHASES = ('successors', 'heuristic', 'queue')
+
+
+class SearchStatistics:
+    """Counters, phase timers and f value progression of the last search of a Solver, along with the time taken by
+    each step of the Solver construction and the statistics of its caches (kept across searches, like the caches
+    themselves). Everything is exported as plain JSON-compatible data by to_dict"""
+    def __init__(self):
+        self.build_times = {}  # Solver construction step -> seconds
+        self.caches = {}  # Name -> LRUCache of the Solver
+        self.reset()
+
+    def timed_build(self, step, func, *args):
+        """Returns func(*args), recording its running time as the one of specified construction step"""
+        start = time.perf_counter()
+        result = func(*args)
+        self.build_times[step] = time.perf_counter() - start
+        return result
+
+    def reset(self):
+        """Starts the statistics of a new search"""
+        self.counters = {counter: 0 for counter in COUNTERS}
+        self.phase_times = {phase: 0. for phase in PHASES}  # Only filled when profiling
+        self.f_progression = []  # (expansions, f) pairs, each time the f value of the expanded nodes reaches a new max
+        self.start, self.end = time.perf_counter(), None
+
+    def to_dict(self):
+        expansions = self.counters['expansions']
+        return {
+            'build_times': dict(self.build_times), 'counters': dict(self.counters),
+            'phase_times': dict(self.phase_times), 'f_progression': list(self.f_progression),
+            'branching_factor': self.counters['generations'] / expansions if expansions > 0 else 0.,
+            'search_time': (self.end or time.perf_counter()) - self.start,
+            'caches': {name: cache.stats() for name, cache in self.caches.items()},
+        }
+
+
+class Instrumentation:
+    """Instrumentation options of a Solver. If profile, the successor generation, the heuristic evaluations and the
+    open list operations are timed (one timer call per operation, so only when asked). The callback, if given, is
+    called as callback(event, statistics dict) on "start", "f_value" (new max f value), "progress" (every
+    progress_interval seconds, if given), "solution" and "end" events, which are also written as JSON lines to stream
+    if given"""
+    def __init__(self, profile=False, callback=None, progress_interval=None, stream=None):
+        self.profile, self.callback, self.progress_interval = profile, callback, progress_interval
+        self.stream = stream
+        self.next_progress = None
+
+    def timed(self, statistics, phase, func):
+        """Returns func wrapped so that its running time is added to specified phase"""
+        if not self.profile:
+            return func
+        phase_times, perf_counter = statistics.phase_times, time.perf_counter
+
+        def timed_func(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                phase_times[phase] += perf_counter() - start
+        return timed_func
+
+    def emit(self, event, statistics):
+        """Sends an event with the current statistics to the callback, or to the stream"""
+        if event == 'start' and self.progress_interval is not None:
+            self.next_progress = time.perf_counter() + self.progress_interval
+        if self.callback is not None:
+            self.callback(event, statistics.to_dict())
+        if self.stream is not None:
+            self.stream.write(json.dumps({'event': event, **statistics.to_dict()}) + '\n')
+            self.stream.flush()
+
+    def tick(self, statistics):
+        """Called regularly by the search, emits a progress event if one is due"""
+        if self.next_progress is not None and time.perf_counter() >= self.next_progress:
+            self.next_progress += self.progress_interval
+            self.emit('progress', statistics)
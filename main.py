@@ -1,10 +1,47 @@
-import pddlpy
+import json
+import sys
 from solver import Solver
+from parsing import load_task
+from plan_output import save_plan
+from instrumentation import Instrumentation
+from portfolio import solve_portfolio
 from config import cfg
 
 
-if __name__ == '__main__':
-    domprob = pddlpy.DomainProblem(cfg["domain"], cfg["problem"])
-    s = Solver(domprob)
-    s.display_plan(s.solve(mode=cfg['heuristic']))
+def make_solver(instrumentation=None):
+    """Returns the Solver of the instance of the config, read from the task cache if possible"""
+    return Solver(load_task(cfg["domain"], cfg["problem"], cfg['task_cache']), cache_size=cfg['heuristic_cache_size'],
+                  instrumentation=instrumentation, table_cache_size=cfg['table_cache_size'])
+
 
+if __name__ == '__main__':
+    instrumentation = Instrumentation(cfg['profile'], progress_interval=cfg['progress_interval'], stream=sys.stderr) \
+        if cfg['profile'] or cfg['progress_interval'] is not None else None
+    if cfg['portfolio']:
+        result = solve_portfolio(cfg['domain'], cfg['problem'], max_workers=cfg['workers'],
+                                 deadline=cfg['portfolio_deadline'], first=cfg['portfolio_first'],
+                                 cache_size=cfg['heuristic_cache_size'], task_cache=cfg['task_cache'])
+        if result is not None:
+            print('Portfolio: plan found with ' + str(result[0]) + ' in ' + str(round(result[3], 3)) + 's')
+        # The Solver displaying the plan is only built once the workers are done, so that none of them inherits it
+        s, plan = make_solver(), (0, None) if result is None else result[1:3]
+    elif cfg['anytime']:
+        s = make_solver(instrumentation)
+        plan = s.solve_anytime(
+            cfg['heuristic'], callback=lambda nb_nodes, actions: print('Plan of length ' + str(len(actions))),
+            time_limit=cfg['time_limit'], max_expansions=cfg['max_expansions'], open_list=cfg['open_list'],
+            tie_breaking=cfg['tie_breaking'], incremental=cfg['incremental'], max_states=cfg['max_states'],
+            memory_policy=cfg['memory_policy'], direction=cfg['direction']
+        )
+    else:
+        s = make_solver(instrumentation)
+        plan = s.solve(mode=cfg['heuristic'], open_list=cfg['open_list'], tie_breaking=cfg['tie_breaking'],
+                       incremental=cfg['incremental'], max_states=cfg['max_states'],
+                       memory_policy=cfg['memory_policy'], search=cfg['search'], weight=cfg['weight'],
+                       direction=cfg['direction'])
+        if cfg['statistics'] is not None:
+            with open(cfg['statistics'], 'w') as statistics:
+                json.dump(s.statistics.to_dict(), statistics, indent=2)
+    s.display_plan(plan)
+    if cfg['plan_output'] is not None and plan[1] is not None:
+        save_plan(s, plan[1], cfg['plan_output'])
@@ -0,0 +1,121 @@
+from collections import deque
+import itertools as itt
+import heapq
+
+
+TIE_BREAKINGS = ('low_g', 'high_g', 'fifo', 'lifo')
+
+
+class HeapOpenList:
+    """Binary heap open list which pops the entry with the smallest f value first. Ties are broken with the tie_breaking
+    rule (lower g, higher g, first-in or last-in first), so that two runs on the same problem pop the same sequence.
+    Entries are indexed by key: pushing a key already open with a smaller g replaces the old entry (decrease-key), the
+    replaced entry being only marked as dead and skipped when it reaches the top of the heap (lazy deletion)"""
+    def __init__(self, tie_breaking='low_g'):
+        assert tie_breaking in TIE_BREAKINGS
+        self.tie_breaking = tie_breaking
+        self.heap = []
+        self.entries = {}  # key -> live entry, entries are [f, tie, count, key, g, value, alive] lists
+        self.counter = itt.count()
+
+    def _tie(self, g, count):
+        """Secondary sorting value of an entry, the insertion count being the last resort"""
+        return {'low_g': g, 'high_g': -g, 'fifo': count, 'lifo': -count}[self.tie_breaking]
+
+    def push(self, key, f, g, value):
+        """Opens key with specified f and g values, or lowers its g value if it is already open. Returns False if key
+        is already open with a lower or equal g value, in which case nothing is done"""
+        if not self.remove(key, g):
+            return False
+        count = next(self.counter)
+        entry = [f, self._tie(g, count), count, key, g, value, True]
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+        return True
+
+    def remove(self, key, g=None):
+        """Kills the open entry of key if it has a greater g value than specified one (always if g is None). Returns
+        False only if key is open and has been kept"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        if g is not None and entry[4] <= g:
+            return False
+        entry[-1] = False
+        del self.entries[key]
+        return True
+
+    def pop(self):
+        """Pops the live entry with smallest (f, tie) value, and returns it as a (key, f, g, value) tuple"""
+        while True:
+            f, _, _, key, g, value, alive = heapq.heappop(self.heap)
+            if alive:
+                del self.entries[key]
+                return key, f, g, value
+
+    def worst(self, n):
+        """Returns the n open (key, f) pairs with the greatest f values, greatest first, the ones with lowest g first
+        in case of tie"""
+        worst_entries = heapq.nlargest(n, self.entries.values(), key=lambda entry: (entry[0], -entry[4]))
+        return [(entry[3], entry[0]) for entry in worst_entries]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_empty(self):
+        return len(self.entries) == 0
+
+
+class BucketOpenList(HeapOpenList):
+    """Bucket queue version of the open list, for integer f values. Each f value has its own bucket and the smallest
+    non-empty one is found by moving a pointer, so insertion is O(1) and popping is amortized O(1) when f values grow
+    slowly, as they do in A*. Buckets are split by g value for the low_g and high_g tie breakings"""
+    def __init__(self, tie_breaking='low_g'):
+        super().__init__(tie_breaking)
+        self.buckets = {}  # f -> {tie g -> deque of entries}
+        self.min_f = None
+
+    def push(self, key, f, g, value):
+        assert f == int(f), 'bucket open lists only accept integer f values'
+        if not self.remove(key, g):
+            return False
+        f = int(f)
+        entry = [f, None, None, key, g, value, True]
+        self.entries[key] = entry
+        bucket = self.buckets.setdefault(f, {})
+        bucket.setdefault(g if self.tie_breaking in ('low_g', 'high_g') else None, deque()).append(entry)
+        self.min_f = f if self.min_f is None else min(self.min_f, f)
+        return True
+
+    def pop(self):
+        """Pops the live entry with smallest (f, tie) value as in HeapOpenList, raising IndexError if there is none.
+        The dead entries left once the last live one is popped are dropped, so that the next push starts afresh"""
+        if len(self.entries) == 0:
+            self.buckets, self.min_f = {}, None
+            raise IndexError('pop from an empty open list')
+        while True:
+            while self.min_f not in self.buckets:
+                self.min_f += 1
+            bucket = self.buckets[self.min_f]
+            tie = {'low_g': min, 'high_g': max}.get(self.tie_breaking, lambda ties: None)(bucket.keys())
+            entries = bucket[tie]
+            _, _, _, key, g, value, alive = entries.pop() if self.tie_breaking == 'lifo' else entries.popleft()
+            if len(entries) == 0:
+                del bucket[tie]
+                if len(bucket) == 0:
+                    del self.buckets[self.min_f]
+            if alive:
+                del self.entries[key]
+                f = self.min_f
+                if len(self.entries) == 0:
+                    self.buckets, self.min_f = {}, None
+                return key, f, g, value
+
+
+def make_open_list(kind='heap', tie_breaking='low_g'):
+    """Returns an empty open list of specified kind ("heap" or "bucket")"""
+    assert kind in ('heap', 'bucket')
+    return (HeapOpenList if kind == 'heap' else BucketOpenList)(tie_breaking)
@@ -1,26 +1,25 @@
 from frozendict import frozendict
-from utils import add_to_sets_dict, merge_sets_dicts, invert_dict, VariablesAssign
+from utils import add_to_sets_dict, merge_sets_dicts, invert_dict, RelationalJoin
 
 
 class OperatorCell:
     """Useful methods to handle an operator"""
-    def __init__(self, op_name, dp, forward=True):
+    def __init__(self, op_name, task, forward=True):
         # The forward arg states if the operation is to be performed from preconditions to effects or the other way
         # around
-        self.op_name, self.dp, self.forward = op_name, dp, forward
-        self.op = self._get_generic_op(self.op_name, self.dp)
+        self.op_name, self.task, self.forward = op_name, task, forward
+        self.op = self.task.operators[self.op_name]  # Lifted operator, its variables names start with "?"
         self.i_pos, self.i_neg, self.o_pos, self.o_neg = self._parse_op(self.op, self.forward)
         self.input_statements = merge_sets_dicts(self.i_pos, self.i_neg)
 
-        self.object_to_type = self.dp.worldobjects()
+        self.object_to_type = self.task.objects
         self.types_to_objects = invert_dict(self.object_to_type)
-        self.object_to_objects = {obj: self.types_to_objects[self.object_to_type[obj]]
-                                  for obj in self.object_to_type.keys()}
 
+        # Constants of the domain are handled as variables which can only take their own name as value
         self.vars_pos, self.vars_neg = self._vars(self.i_pos), self._vars(self.i_neg)
-        self.vars_neg_subs = {var: self.op.variable_list[var] if var[0] == '?' else self.object_to_objects[var]
-                              for var in self.vars_neg - self.vars_pos}
-        self.vars_assign = VariablesAssign(self.vars_pos | self.vars_neg)
+        self.vars_neg_subs = {var: self.types_to_objects.get(self.op.variable_list[var], set()) if var[0] == '?'
+                              else {var} for var in self.vars_neg - self.vars_pos}
+        self.join = RelationalJoin(self.i_pos, self.i_neg, self.vars_neg_subs)
 
     @staticmethod
     def _build_statements_dict(statements):
@@ -39,21 +38,13 @@ class OperatorCell:
             [[vars_.update({lit}) for lit in vc_list] for vc_list in vars_and_consts]
         return vars_
 
-    @staticmethod
-    def _get_generic_op(op_name, dp):
-        """Extracts the version of the op with most diversified set of variable names (avoid cases where different
-        variables have been given, the same name) from the shitty pddlpy operators format"""
-        dumb_ops_by_dumb_dev = list(dp.ground_operator(op_name))
-        nb_diff_vars = [len(set(dumb_op.variable_list.values())) for dumb_op in dumb_ops_by_dumb_dev]
-        return dumb_ops_by_dumb_dev[max(range(len(nb_diff_vars)), key=lambda i: nb_diff_vars[i])]
-
     def _parse_op(self, op, forward):
         """Uses the value of the forward arg to decide the inputs and outputs sets from preconditions and effects"""
+        pre_pos, pre_neg, eff_pos, eff_neg = op.precondition_pos, op.precondition_neg, op.effect_pos, op.effect_neg
         op_statements = map(
             self. _build_statements_dict,
-            (op.precondition_pos, op.precondition_neg, op.effect_pos, op.effect_neg) if forward
-            else (op.effect_pos | (op.precondition_pos - op.effect_neg), op.effect_neg,
-                  op.precondition_pos & op.effect_neg, op.effect_pos)
+            (pre_pos, pre_neg, eff_pos, eff_neg) if forward
+            else (eff_pos | (pre_pos - eff_neg), eff_neg, pre_pos & eff_neg, eff_pos)
         )
         return op_statements
 
@@ -66,35 +57,16 @@ class OperatorCell:
             effects |= {(operator, *(assignation[vc] for vc in vc_list)) for vc_list in variables}
         return frozenset(effects)
 
-    def get_possible_assignations(self, statements):
-        """From an input set of statements, determines all possible variables assignation that can lead to an action
-        using the VariablesAssign structure and keeps only those which meet the feasibility criteria: all positive
-        preconditions are in input statements and no negatives are"""
-        pos_statements = [st for st in statements if st[0] in self.i_pos.keys()]
-
-        pos_assigns = sum([
-            [frozendict({var: val for var, val in zip(var_names, s[1:])}) for var_names in self.input_statements[s[0]]]
-            for s in list(pos_statements)
-        ], [])
-        no_pos_assigns = sum(
-            [[frozendict({var: val}) for val in self.vars_neg_subs[var]] for var in self.vars_neg_subs.keys()], []
-        )
+    def get_possible_assignations(self, statements, relaxed=False):
+        """From an input set of statements, determines all variables assignations meeting the feasibility criteria: all
+        positive preconditions are in input statements and no negatives are (unless relaxed, then negatives are
+        ignored). Assignations are found by joining the statements matching each precondition (see RelationalJoin)"""
+        return self.join.assignations(statements, relaxed)
 
-        possible_assignations = set()
-        possible_assignations |= self.vars_assign.process_assignations(pos_assigns)
-        possible_assignations |= self.vars_assign.process_assignations(no_pos_assigns)
-        possible_assignations = list(filter(
-            lambda assign: all([len(statements & self.effects_of_assignation(assign, self.i_neg)) == 0,
-                                statements.issuperset(self.effects_of_assignation(assign, self.i_pos))]),
-            possible_assignations
-        ))
-        self.vars_assign.reset()
-        return possible_assignations
-
-    def get_possible_actions(self, statements):
+    def get_possible_actions(self, statements, relaxed=False):
         """Given a set of statements, finds all suitable variables assignations and returns the associated actions
         as frozen dictionaries summarising their behavior"""
-        possible_assignations = self.get_possible_assignations(statements)
+        possible_assignations = self.get_possible_assignations(statements, relaxed)
         possible_actions = [frozendict(
             {"name": self.op_name, "vars": assign,
              "precond_pos": self.effects_of_assignation(assign, self.i_pos),
@@ -110,32 +82,36 @@ class OperatorCell:
 class OperatorsManager:
     """Creates all necessary op cells and sends them statements in a smart way"""
 
-    def __init__(self, dp):
-        # Each action is created in a forward and a backward version
-        self.dom_prob = dp
+    def __init__(self, task):
+        # Each action is created in a forward version, and in a backward version on the first backward request (the
+        # backward search regresses partial states over the ground actions instead, see grounding.Regression)
+        self.task = task
         self.forward_actions, self.forward_actions_mapper = self._build_actions_and_mapper(True)
-        self.backward_actions, self.backward_actions_mapper = self._build_actions_and_mapper(False)
+        self.backward_actions, self.backward_actions_mapper = None, None
 
     def _build_actions_and_mapper(self, forward):
         """Creates a OpCell object for each action, and updates the mapper to send them only statements that are useful
         for their respective variables assignation"""
         ops, mapper = [], {}
-        for i, op_name in enumerate(self.dom_prob.operators()):
-            op_cell = OperatorCell(op_name, self.dom_prob, forward)
+        for i, op_name in enumerate(self.task.operators):
+            op_cell = OperatorCell(op_name, self.task, forward)
             [add_to_sets_dict(mapper, st_name, i) for st_name in op_cell.input_statements.keys()]
             ops.append(op_cell)
         return ops, mapper
 
-    def get_applicable_actions(self, state, forward=True):
+    def get_applicable_actions(self, state, forward=True, relaxed=False):
         """Given an input state described by a set of statements, use each OpCell's get_possible_actions method to
-        build the list of all possible actions from this state"""
+        build the list of all possible actions from this state (ignoring negative preconditions if relaxed)"""
+        if not forward and self.backward_actions is None:
+            self.backward_actions, self.backward_actions_mapper = self._build_actions_and_mapper(False)
         actions, mapper = (self.forward_actions, self.forward_actions_mapper) if forward else \
             (self.backward_actions, self.backward_actions_mapper)
         ops_statements = [set() for _ in actions]
         for statement in state:
-            [ops_statements[i].update({statement}) for i in mapper[statement[0]]]
+            [ops_statements[i].update({statement}) for i in mapper.get(statement[0], ())]
         applicable_actions = sum([
-            op_cell.get_possible_actions(op_statements) for op_cell, op_statements in zip(actions, ops_statements)
+            op_cell.get_possible_actions(op_statements, relaxed)
+            for op_cell, op_statements in zip(actions, ops_statements)
         ], [])
         return applicable_actions
 
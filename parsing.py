@@ -0,0 +1,151 @@
+from pddlpy.pddl import FileStream, CommonTokenStream, ParseTreeWalker, pddlLexer, pddlParser, DomainListener, \
+    ProblemListener
+from states import AtomTable
+import hashlib
+import pddlpy
+import pickle
+import os
+
+
+TASK_FORMAT_VERSION = 1  # To be increased whenever the content of the task files changes
+
+
+def parse(domain, problem):
+    """Parses a domain and a problem file into a pddlpy DomainProblem"""
+    return pddlpy.DomainProblem(domain, problem)
+
+
+# ---------------------------------------------------- COMPILED TASKS --------------------------------------------------
+
+
+class OperatorSchema:
+    """Lifted operator: types of its parameters ({"?var": type} variable_list) and preconditions and effects as sets
+    of (predicate, *variables and constants) tuples"""
+    def __init__(self, name, variable_list, precondition_pos, precondition_neg, effect_pos, effect_neg):
+        self.operator_name, self.variable_list = name, variable_list
+        self.precondition_pos, self.precondition_neg = precondition_pos, precondition_neg
+        self.effect_pos, self.effect_neg = effect_pos, effect_neg
+
+
+class Task:
+    """Everything the solver needs from a domain/problem pair, as plain python data: the type of each object, the
+    operator schemas (in domain order) and the initial and goal states as sets of ground atoms tuples"""
+    def __init__(self, objects, operators, initial_state, goal_state):
+        self.objects, self.operators = objects, operators
+        self.initial_state, self.goal_state = frozenset(initial_state), frozenset(goal_state)
+
+    def to_data(self):
+        """Returns the compact form of the task stored in task files, ground atoms being interned"""
+        atoms = AtomTable(self.initial_state | self.goal_state)
+        return {
+            'version': TASK_FORMAT_VERSION, 'objects': self.objects, 'atoms': atoms.atoms,
+            'operators': [(op.operator_name, op.variable_list, *map(sorted, (
+                op.precondition_pos, op.precondition_neg, op.effect_pos, op.effect_neg
+            ))) for op in self.operators.values()],
+            'initial_state': sorted(atoms.ids[atom] for atom in self.initial_state),
+            'goal_state': sorted(atoms.ids[atom] for atom in self.goal_state),
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        atoms = data['atoms']
+        operators = {}
+        for name, variable_list, *statements in data['operators']:
+            operators[name] = OperatorSchema(name, variable_list, *map(frozenset, statements))
+        return cls(data['objects'], operators, [atoms[i] for i in data['initial_state']],
+                   [atoms[i] for i in data['goal_state']])
+
+
+class Domain:
+    """Part of a Task which only depends on the domain file: the types of its constants and its operator schemas. It
+    is compiled once and shared by the tasks of all the problems of the domain (see compile_problem)"""
+    def __init__(self, constants, operators):
+        self.constants, self.operators = constants, operators
+
+
+def _compile_operators(operators):
+    """Returns the OperatorSchema of each pddlpy operator"""
+    return {name: OperatorSchema(name, dict(op.variable_list), *[
+        frozenset(tuple(atom.predicate) for atom in atoms)
+        for atoms in (op.precondition_pos, op.precondition_neg, op.effect_pos, op.effect_neg)
+    ]) for name, op in operators.items()}
+
+
+def _walk(listener, path, rule):
+    """Parses a PDDL file with the specified rule of the grammar ("domain" or "problem") into the listener"""
+    parser = pddlParser(CommonTokenStream(pddlLexer(FileStream(path, encoding="utf-8"))))
+    ParseTreeWalker().walk(listener, getattr(parser, rule)())
+    return listener
+
+
+def compile_task(domain_problem):
+    """Extracts the Task of a parsed pddlpy DomainProblem"""
+    return Task(dict(domain_problem.worldobjects()), _compile_operators(domain_problem.domain.operators),
+                [tuple(atom.predicate) for atom in domain_problem.initialstate()],
+                [tuple(atom.predicate) for atom in domain_problem.goals()])
+
+
+def compile_domain(domain):
+    """Parses a domain file alone into a Domain"""
+    listener = _walk(DomainListener(), domain, 'domain')
+    return Domain(dict(listener.objects), _compile_operators(listener.operators))
+
+
+def compile_problem(domain, problem):
+    """Returns the Task of a problem file of a compiled Domain, only the problem file being parsed"""
+    listener = _walk(ProblemListener(), problem, 'problem')
+    return Task({**domain.constants, **listener.objects}, domain.operators,
+                [tuple(atom.predicate) for atom in listener.initialstate],
+                [tuple(atom.predicate) for atom in listener.goals])
+
+
+def task_key(domain, problem):
+    """Returns the hash of the content of a domain and a problem file, which identifies their compiled task"""
+    digest = hashlib.sha256(str(TASK_FORMAT_VERSION).encode())
+    for path in (domain, problem):
+        with open(path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def save_task(task, path):
+    """Writes the task file, through a temporary file so that concurrent readers never see a partial file"""
+    temporary_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(task.to_data(), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def read_task(path):
+    """Reads a task file, returns None if it is missing, unreadable, of another format version or with bad contents
+    (any error while unpickling or rebuilding the task counts as a miss, the task file being written again)"""
+    try:
+        with open(path, 'rb') as file:
+            data = pickle.load(file)
+        if not isinstance(data, dict) or data.get('version') != TASK_FORMAT_VERSION:
+            return None
+        return Task.from_data(data)
+    except Exception:
+        return None
+
+
+def _compile_pair(domain, problem, compiled_domain=None):
+    if compiled_domain is None:
+        return compile_task(parse(domain, problem))
+    return compile_problem(compiled_domain, problem)
+
+
+def load_task(domain, problem, cache_dir=None, compiled_domain=None):
+    """Returns the Task of a domain/problem pair. If cache_dir is given, it is read from the task file named after the
+    content hash of both files, so that solving the same instance again skips parsing entirely; on a miss, the pair
+    is parsed and the task file is written. If given, compiled_domain is the Domain of the domain file, so that only
+    the problem file is parsed"""
+    if cache_dir is None:
+        return _compile_pair(domain, problem, compiled_domain)
+    path = os.path.join(cache_dir, task_key(domain, problem) + '.task')
+    task = read_task(path)
+    if task is None:
+        task = _compile_pair(domain, problem, compiled_domain)
+        os.makedirs(cache_dir, exist_ok=True)
+        save_task(task, path)
+    return task
@@ -0,0 +1,86 @@
+import json
+import sys
+
+
+PLAN_FORMATS = ('ipc', 'jsonl')
+
+
+def action_arguments(task, action):
+    """Returns the objects of a ground action in the order of the parameters of its operator"""
+    return [action['vars'][param] for param in task.operators[action['name']].variable_list]
+
+
+def iter_steps(solver, actions, deltas=False):
+    """Yields one compact record per step of a plan: its number, action name and arguments, and if deltas, the atoms
+    it actually adds to and deletes from the current state (replayed on bitsets, so each step costs the size of the
+    action rather than the size of the state)"""
+    atoms, state = solver.atoms, solver.atoms.encode(solver.initial_state)
+    for i, action in enumerate(actions):
+        step = {'step': i, 'action': action['name'], 'arguments': action_arguments(solver.task, action)}
+        if deltas:
+            effect_pos, effect_neg = atoms.encode(action['effect_pos']), atoms.encode(action['effect_neg'])
+            added, deleted = effect_pos & ~state, effect_neg & state & ~effect_pos
+            state = (state & ~effect_neg) | effect_pos
+            step['added'], step['deleted'] = sorted(atoms.decode(added)), sorted(atoms.decode(deleted))
+        yield step
+
+
+def format_ipc(step):
+    """Returns the line of a step in the IPC plan format read by VAL: (action arg1 arg2 ...)"""
+    return '(' + ' '.join([step['action'], *step['arguments']]) + ')\n'
+
+
+def write_plan(steps, stream, fmt='ipc'):
+    """Writes the steps one at a time to a text stream, in the IPC format (followed by its cost comment) or as JSON
+    Lines. Returns the number of steps written"""
+    assert fmt in PLAN_FORMATS
+    nb_steps = 0
+    for step in steps:
+        stream.write(format_ipc(step) if fmt == 'ipc' else json.dumps(step) + '\n')
+        nb_steps += 1
+    if fmt == 'ipc':
+        stream.write('; cost = ' + str(nb_steps) + ' (unit cost)\n')
+    return nb_steps
+
+
+def save_plan(solver, actions, path, fmt=None, deltas=False):
+    """Writes a plan to a file, as JSON Lines if fmt is "jsonl" or if path ends with .jsonl, in the IPC format
+    otherwise"""
+    fmt = fmt or ('jsonl' if path.endswith('.jsonl') else 'ipc')
+    with open(path, 'w') as file:
+        return write_plan(iter_steps(solver, actions, deltas), file, fmt)
+
+
+def validate_plan(solver, actions):
+    """Replays a plan from the initial state on bitsets. Returns (True, None) if every action is applicable in turn
+    and the goals hold at the end, else (False, reason)"""
+    atoms, state = solver.atoms, solver.atoms.encode(solver.initial_state)
+    for i, action in enumerate(actions):
+        pre_pos, pre_neg = atoms.encode(action['precond_pos']), atoms.encode(action['precond_neg'])
+        if state & pre_pos != pre_pos:
+            return False, 'step ' + str(i) + ' (' + action['name'] + '): missing ' + str(sorted(
+                atoms.decode(pre_pos & ~state)))
+        if state & pre_neg:
+            return False, 'step ' + str(i) + ' (' + action['name'] + '): forbidden ' + str(sorted(
+                atoms.decode(state & pre_neg)))
+        state = (state & ~atoms.encode(action['effect_neg'])) | atoms.encode(action['effect_pos'])
+    goal = atoms.encode(solver.goal_state)
+    if state & goal != goal:
+        return False, 'goals not reached: ' + str(sorted(atoms.decode(goal & ~state)))
+    return True, None
+
+
+def print_plan(solver, plan, stream=None):
+    """Writes a readable summary of a (number of explored nodes, actions) result to a stream (stdout by default):
+    one line per step with the atoms it adds and deletes, then the validation result"""
+    stream = stream or sys.stdout
+    nb_nodes, actions = plan
+    if actions is None:
+        stream.write('No plan found\n')
+        return
+    stream.write('Plan of length ' + str(len(actions)) + ' found in ' + str(nb_nodes) + ' node explorations:\n')
+    for step in iter_steps(solver, actions, deltas=True):
+        stream.write('{:>4} {}    +{} -{}\n'.format(step['step'], format_ipc(step).rstrip('\n'), step['added'],
+                                                    step['deleted']))
+    valid, reason = validate_plan(solver, actions)
+    stream.write('Objective completed !\n' if valid else 'Invalid plan: ' + reason + '\n')
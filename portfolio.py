@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from multiprocessing import Manager
+from solver import Solver
+from parsing import load_task
+import time
+
+
+PORTFOLIO = (  # Keyword arguments of Solver.solve for each configuration of the portfolio
+    {'mode': 'h_ff', 'search': 'gbfs'},
+    {'mode': 'h_add', 'search': 'gbfs'},
+    {'mode': 'h_add', 'search': 'wastar', 'weight': 3},
+    {'mode': 'h_add', 'search': 'gbfs', 'direction': 'bidirectional'},
+    {'mode': 'h_max', 'search': 'astar'},
+    {'mode': 'zero', 'search': 'bfs'},
+)
+
+
+def solve_config(task, config, cache_size, stop_event):
+    """Worker side of the portfolio: runs Solver.solve on the compiled task with the configuration. Returns the
+    configuration, the number of explored nodes, the plan (None if not found) and the solving time"""
+    start = time.time()
+    solver = Solver(task, cache_size=cache_size)
+    nb_nodes, plan = solver.solve(stop_event=stop_event, **config)
+    return config, nb_nodes, plan, time.time() - start
+
+
+def solve_portfolio(domain, problem, configs=PORTFOLIO, max_workers=None, deadline=None, first=True, cache_size=None,
+                    task_cache=None):
+    """Compiles the instance once (or reads it from the task_cache directory, see parsing.load_task), then runs every
+    configuration in parallel in a process pool. If first, returns as soon as one of them finds a plan,
+    else waits for all of them and keeps the shortest plan. In both cases, stops waiting after deadline seconds (if
+    given). Remaining workers are cancelled, running ones being told to stop. Returns the result of solve_config for
+    the retained configuration, or None if no plan has been found"""
+    best, task = None, load_task(domain, problem, task_cache)
+    with Manager() as manager, ProcessPoolExecutor(max_workers) as executor:
+        stop_event = manager.Event()
+        futures = [executor.submit(solve_config, task, config, cache_size, stop_event) for config in configs]
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                result = future.result()
+                if result[2] is not None and (best is None or len(result[2]) < len(best[2])):
+                    best = result
+                    if first:
+                        break
+        except TimeoutError:
+            pass
+        stop_event.set()
+        [future.cancel() for future in futures]
+    return best
@@ -0,0 +1,242 @@
+from states import iter_ids
+import tempfile
+import sqlite3
+import json
+import os
+
+
+MEMORY_POLICIES = ('spill', 'sma')
+
+
+class StateRegistry:
+    """Transposition table of the search: gives each generated state bitset an integer id and keeps its g value, its
+    parent id and the index of the action leading to it, so that the plan is rebuilt from parent pointers at the end.
+    If max_states is given, the number of nodes kept in memory is bounded following the policy: "spill" moves closed
+    nodes to an on-disk SQLite store (still used for duplicate detection and plan extraction), while "sma" lets the
+    solver forget open leaves, SMA* style (see Solver.solve)"""
+    def __init__(self, max_states=None, policy='spill'):
+        assert policy in MEMORY_POLICIES
+        self.max_states, self.policy = max_states, policy
+        self.ids = {}  # state bitset -> id, for the nodes in memory
+        self.nodes = {}  # id -> [state, g, parent id, action index, number of children in memory]
+        self.closed = set()  # ids of the expanded nodes in memory
+        self.count = 0  # Number of ids given so far
+        self.store, self.store_path = None, None
+
+    def lookup(self, state):
+        """Returns the id of the state bitset, or None if it is unknown"""
+        node = self.ids.get(state)
+        if node is None and self.store is not None:
+            row = self.store.execute('SELECT id FROM nodes WHERE state = ?', (self._to_blob(state),)).fetchone()
+            node = None if row is None else row[0]
+        return node
+
+    def _record(self, node):
+        """Returns the [state, g, parent, action] record of a node, from memory or from the store"""
+        record = self.nodes.get(node)
+        if record is None:
+            state, g, parent, action = self.store.execute(
+                'SELECT state, g, parent, action FROM nodes WHERE id = ?', (node,)
+            ).fetchone()
+            record = [int.from_bytes(state, 'little'), g, parent, action]
+        return record
+
+    def state(self, node):
+        return self._record(node)[0]
+
+    def g(self, node):
+        return self._record(node)[1]
+
+    def parent(self, node):
+        return self._record(node)[2]
+
+    def path(self, node):
+        """Returns the indices of the actions leading from the root to specified node"""
+        actions = []
+        _, _, parent, action = self._record(node)[:4]
+        while parent is not None:
+            actions.append(action)
+            _, _, parent, action = self._record(parent)[:4]
+        return actions[::-1]
+
+    def nb_children(self, node):
+        return self.nodes[node][4]
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, state, g, parent=None, action=None):
+        """Registers the state bitset as reached with cost g from parent through action. Returns its id and True if
+        the state is new or has been reached for cheaper (its node is then open again, keeping its children in memory
+        which still point to it), else False"""
+        node, nb_children = self.lookup(state), 0
+        if node is None:
+            node, self.count = self.count, self.count + 1
+        elif g < self.g(node):
+            nb_children = self.nodes[node][4] if node in self.nodes else 0
+            self._unlink(node)
+        else:
+            return node, False
+        self.ids[state] = node
+        self.nodes[node] = [state, g, parent, action, nb_children]
+        if parent in self.nodes:
+            self.nodes[parent][4] += 1
+        if self.policy == 'spill' and self.is_full() and len(self.closed) > 0:
+            self.spill()
+        return node, True
+
+    def close(self, node):
+        """Marks the node as expanded"""
+        self.closed.add(node)
+
+    def reopen(self, node):
+        self.closed.discard(node)
+
+    def forget(self, node):
+        """Drops the node from memory, as if its state had never been generated"""
+        self._unlink(node)
+
+    def _unlink(self, node):
+        """Removes the node from memory and from the store, and from its parent children count"""
+        record = self.nodes.pop(node, None)
+        if record is None:
+            self.store.execute('DELETE FROM nodes WHERE id = ?', (node,))
+        else:
+            del self.ids[record[0]]
+            self.closed.discard(node)
+            if record[2] in self.nodes:
+                self.nodes[record[2]][4] -= 1
+
+    def is_full(self):
+        return self.max_states is not None and len(self.nodes) > self.max_states
+
+    @staticmethod
+    def _to_blob(state):
+        return state.to_bytes((state.bit_length() + 7) // 8, 'little')
+
+    def spill(self):
+        """Moves every closed node from memory to the on-disk store"""
+        if self.store is None:
+            fd, self.store_path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            self.store = sqlite3.connect(self.store_path)
+            self.store.execute('CREATE TABLE nodes (id INTEGER PRIMARY KEY, state BLOB UNIQUE, g, parent, action)')
+        closed = [(node, self.nodes.pop(node)) for node in self.closed]
+        self.store.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?)', [
+            (node, self._to_blob(state), g, parent, action) for node, (state, g, parent, action, _) in closed
+        ])
+        for _, record in closed:
+            del self.ids[record[0]]
+        self.closed = set()
+
+    def close_store(self):
+        """Deletes the on-disk store, if any"""
+        if self.store is not None:
+            self.store.close()
+            os.remove(self.store_path)
+            self.store, self.store_path = None, None
+
+
+class MeetingIndex:
+    """Finds the meeting points of a bidirectional search, where a forward state satisfies a backward subgoal (see
+    grounding.Regression). Forward states are indexed by each of their atoms and subgoals by the lowest atom of their
+    pos part, so that neither frontier is scanned entirely when a node is added to the other one. Each node comes
+    with its g value, so that with a cost_bound only meeting points on plans shorter than it are returned. If
+    max_states is given, at most max_states states and max_states subgoals are kept in memory, the others being
+    spilled to an on-disk SQLite store with the same indexes, still searched for meeting points (see StateRegistry)"""
+    def __init__(self, regression, cost_bound=None, max_states=None):
+        self.regression, self.cost_bound, self.max_states = regression, cost_bound, max_states
+        self.states = [[] for _ in range(regression.shift)]  # atom id -> (state, node, g) of the states holding it
+        self.all_states = []
+        self.subgoals = {}  # lowest atom id of pos (-1 if pos is empty) -> (subgoal, node, g) triples
+        self.nb_subgoals = 0  # Number of subgoals in memory
+        self.store, self.store_path = None, None
+
+    def _within_bound(self, g, other_g):
+        return self.cost_bound is None or g + other_g < self.cost_bound
+
+    def __len__(self):
+        """Number of states and subgoals in memory"""
+        return len(self.all_states) + self.nb_subgoals
+
+    def add_state(self, state, node, g=0):
+        """Registers a forward node, and returns the node of a subgoal it satisfies (None if there is none)"""
+        self.all_states.append((state, node, g))
+        [self.states[i].append((state, node, g)) for i in iter_ids(state)]
+        if self.max_states is not None and len(self.all_states) > self.max_states:
+            self.spill_states()
+        for i in [-1, *iter_ids(state)]:
+            for subgoal, subgoal_node, subgoal_g in self.subgoals.get(i, ()):
+                if self._within_bound(g, subgoal_g) and self.regression.satisfied(subgoal, state):
+                    return subgoal_node
+        if self.store is not None:
+            for subgoal, subgoal_node, subgoal_g in self.store.execute(
+                    'SELECT subgoal, node, g FROM subgoals WHERE lowest IN (SELECT value FROM json_each(?))',
+                    (json.dumps([-1, *iter_ids(state)]),)):
+                subgoal = int.from_bytes(subgoal, 'little')
+                if self._within_bound(g, subgoal_g) and self.regression.satisfied(subgoal, state):
+                    return subgoal_node
+        return None
+
+    def add_subgoal(self, subgoal, node, g=0):
+        """Registers a backward node, and returns the node of a state satisfying it (None if there is none)"""
+        pos, _ = self.regression.split(subgoal)
+        lowest = next(iter_ids(pos), -1)
+        self.subgoals.setdefault(lowest, []).append((subgoal, node, g))
+        self.nb_subgoals += 1
+        if self.max_states is not None and self.nb_subgoals > self.max_states:
+            self.spill_subgoals()
+        candidates = self.all_states if lowest == -1 else min((self.states[i] for i in iter_ids(pos)), key=len)
+        for state, state_node, state_g in candidates:
+            if self._within_bound(g, state_g) and self.regression.satisfied(subgoal, state):
+                return state_node
+        if self.store is not None:
+            # The spilled states holding the rarest pos atom, or all of them if pos is empty
+            rarest = None if lowest == -1 else min(iter_ids(pos), key=lambda i: self.store.execute(
+                'SELECT COUNT(*) FROM state_atoms WHERE atom = ?', (i,)).fetchone()[0])
+            for state, state_node, state_g in self.store.execute(
+                    'SELECT state, node, g FROM states' if rarest is None else
+                    'SELECT state, node, g FROM states JOIN state_atoms USING (id) WHERE atom = ?',
+                    () if rarest is None else (rarest,)):
+                state = int.from_bytes(state, 'little')
+                if self._within_bound(g, state_g) and self.regression.satisfied(subgoal, state):
+                    return state_node
+        return None
+
+    def _open_store(self):
+        if self.store is None:
+            fd, self.store_path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            self.store = sqlite3.connect(self.store_path)
+            self.store.executescript("""
+                CREATE TABLE states (id INTEGER PRIMARY KEY, state BLOB, node, g);
+                CREATE TABLE state_atoms (atom INTEGER, id INTEGER);
+                CREATE INDEX state_atoms_atom ON state_atoms (atom);
+                CREATE TABLE subgoals (lowest INTEGER, subgoal BLOB, node, g);
+                CREATE INDEX subgoals_lowest ON subgoals (lowest);
+            """)
+        return self.store
+
+    def spill_states(self):
+        """Moves every state in memory to the on-disk store"""
+        store = self._open_store()
+        for state, node, g in self.all_states:
+            row = store.execute('INSERT INTO states (state, node, g) VALUES (?, ?, ?)',
+                                (StateRegistry._to_blob(state), node, g)).lastrowid
+            store.executemany('INSERT INTO state_atoms VALUES (?, ?)', [(i, row) for i in iter_ids(state)])
+        self.states, self.all_states = [[] for _ in range(self.regression.shift)], []
+
+    def spill_subgoals(self):
+        """Moves every subgoal in memory to the on-disk store"""
+        self._open_store().executemany('INSERT INTO subgoals VALUES (?, ?, ?, ?)', [
+            (lowest, StateRegistry._to_blob(subgoal), node, g)
+            for lowest, triples in self.subgoals.items() for subgoal, node, g in triples
+        ])
+        self.subgoals, self.nb_subgoals = {}, 0
+
+    def close_store(self):
+        """Deletes the on-disk store, if any"""
+        if self.store is not None:
+            self.store.close()
+            os.remove(self.store_path)
+            self.store, self.store_path = None, None
@@ -1,122 +1,348 @@
 from operators import OperatorsManager
-from graph import GraphManager
-from utils import merge_sets_dicts, WeightedQueue
-import functools as fct
+from graph import RelaxedPlanningGraph
+from utils import LRUCache
+from open_list import make_open_list
+from grounding import GroundActions, Regression
+from heuristics import RelaxedExploration, RegressionHeuristic, INFINITY, INCREMENTAL_HEURISTICS, ADMISSIBLE_HEURISTICS
+from registry import StateRegistry, MeetingIndex
+from states import includes, iter_ids
+from instrumentation import SearchStatistics
+from plan_output import print_plan
+from parsing import Task, compile_task
+import time
 
 
-class Solver:
-    """Implements the solving algorithm for the dom-prob instance"""
-    def __init__(self, dp):
-        self.dp = dp
-        self.initial_state = frozenset({tuple(atom.predicate) for atom in self.dp.initialstate()})
-        self.goal_state = frozenset({tuple(atom.predicate) for atom in self.dp.goals()})
-        self.operators_manager = OperatorsManager(dp)  # Methods to apply operators
-        self.rgp, self.unsolvable = self.build_relaxed_graph_plan()  # Creation of the relaxed GraphPlan
-        self.depth = (len(self.rgp.layers) + 1) // 2
-        self.cache = {}
+DIRECTIONS = ('forward', 'backward', 'bidirectional')
+ANYTIME_SCHEDULE = (  # (search, weight) pairs of the anytime search, non integer weights need the heap open list
+    ('gbfs', 1), ('wastar', 5), ('wastar', 3), ('wastar', 2), ('wastar', 1.5), ('astar', 1),
+)
+SEARCHES = {  # f value of a node from its g value, its h value and the weight
+    'astar': lambda g, h, w: g + h,
+    'wastar': lambda g, h, w: g + w * h,
+    'gbfs': lambda g, h, w: h,
+    'bfs': lambda g, h, w: g,
+}
 
-    def build_relaxed_graph_plan(self):
-        """Builds the relaxed graph plan from initial state"""
-        rgp, total_statements, us = GraphManager(), self.initial_state, False
-        rgp.add_layer(total_statements, layer_params={"type": "statements"})
-        while True:
-            possible_actions = self.operators_manager.get_applicable_actions(total_statements) \
-                + [self.operators_manager.void_action(total_statements)]
 
-            new_statements = fct.reduce(
-                lambda s1, s2: s1 | s2, [action["effect_pos"] for action in possible_actions], set()
-            )
-            if total_statements.issuperset(new_statements):
-                # Breaks when no additional statement is obtained
-                us = True
-                break
-            total_statements = total_statements | new_statements
+class Solver:
+    """Implements the solving algorithm for the dom-prob instance. Heuristic values are memoized in an LRU cache of
+    at most cache_size states (None for no bound, 0 to disable it), and the exploration tables of the incremental
+    heuristics in one of table_cache_size states. Counters and construction times are always kept
+    in self.statistics, the optional instrumentation (see Instrumentation) adds phase timers and search events. The
+    instance is given as a compiled Task (see parsing.load_task) or as a pddlpy DomainProblem"""
+    def __init__(self, task, cache_size=100000, instrumentation=None, table_cache_size=1000):
+        self.statistics, self.instrumentation = SearchStatistics(), instrumentation
+        self.task = task if isinstance(task, Task) else self.statistics.timed_build('compilation', compile_task, task)
+        self.initial_state, self.goal_state = self.task.initial_state, self.task.goal_state
+        # Methods to apply operators
+        self.operators_manager = self.statistics.timed_build('operators', OperatorsManager, self.task)
+        # Reachable actions are grounded once, atoms getting integer ids and states of the search being bitsets
+        self.grounding = self.statistics.timed_build(
+            'grounding', GroundActions, self.operators_manager, self.initial_state, self.goal_state
+        )
+        self.atoms = self.grounding.atoms
+        # Creation of the relaxed GraphPlan, the goals being unreachable even in the relaxation if it never reaches them
+        self.rgp = self.statistics.timed_build(
+            'relaxed_graph', RelaxedPlanningGraph, self.grounding, self.initial_state, self.goal_state
+        )
+        self.unsolvable = self.rgp.goal_level is None
+        # h_max, h_add and h_ff evaluations
+        self.heuristic = self.statistics.timed_build('heuristic', RelaxedExploration, self.grounding, self.goal_state)
+        # Regression from the goals, its heuristic values being read from an exploration of the initial state
+        self.regression = Regression(self.grounding, self.initial_state, self.goal_state)
+        self.regression_heuristic = self.statistics.timed_build(
+            'regression_heuristic', RegressionHeuristic, self.heuristic, self.regression.initial_state
+        )
+        self.cache = LRUCache(cache_size)  # (state, heuristic) -> heuristic value
+        self.tables = LRUCache(table_cache_size)  # (state, heuristic) -> complete exploration table
+        self.statistics.caches = {'heuristic': self.cache, 'tables': self.tables}
 
-            possible_precond_per_name, possible_effect_per_name = {}, {}
-            for action in possible_actions:
-                possible_precond_per_name = merge_sets_dicts(possible_precond_per_name,
-                                                             {action["name"]: action["precond_pos"]})
-                possible_effect_per_name = merge_sets_dicts(possible_effect_per_name,
-                                                            {action["name"]: action["effect_pos"]})
+    def compute_heuristic(self, state, mode='h_max', parent=None):
+        """ Compute heuristic value for a given state bitset. If given, parent is a (parent state, parent exploration
+        table) pair from which the value is updated incrementally instead of being computed from scratch. """
+        value = self.cache.get((state, mode))
+        if value is None:
+            if parent is not None:
+                value, table = self.heuristic.evaluate_incremental(*parent, state, mode)
+                self.tables.put((state, mode), table)
+            else:
+                value = self.heuristic.evaluate(state, mode)
+            self.cache.put((state, mode), value)
+        return value
 
-            rgp.add_layer(
-                list(possible_precond_per_name.keys()),
-                connection_func=lambda statement, action: statement in possible_precond_per_name[action],
-                layer_params={"type": "actions"}
-            )
-            rgp.add_layer(
-                total_statements,
-                connection_func=lambda action, statement: statement in possible_effect_per_name[action],
-                layer_params={"type": "statements"}
-            )
+    def exploration_table(self, state, mode='h_max'):
+        """Returns the complete exploration table of a state bitset for an incremental heuristic, the one kept when the
+        state has been evaluated from its parent if it is still cached"""
+        table = self.tables.get((state, mode))
+        return self.heuristic.table(state, mode) if table is None else table
 
-            if total_statements.issuperset(self.goal_state):
-                # Or breaks when relaxed final state is reached
-                break
-        return rgp, us
+    def compute_regression_heuristic(self, subgoal, mode='h_max', parent=None):
+        """Compute heuristic value for a subgoal of the regression (see RegressionHeuristic), parent is ignored"""
+        return self.regression_heuristic.evaluate(list(iter_ids(self.regression.split(subgoal)[0])), mode)
 
-    def gs(self, rgp, state, goal_atom_index, table):
-        """ Compute G value for given state and goal atom"""
-        if rgp.node_labels[goal_atom_index] in state:
-            return 0
-        elif goal_atom_index in table.keys():
-            return table[goal_atom_index]
-        else:
-            actions = rgp.graph.predecessors(goal_atom_index)
-            actions_predecessors = [rgp.graph.predecessors(action) for action in actions]
-            actions_predecessors_gs = [
-                max([self.gs(rgp, state, i, table) for i in pred_list]) for pred_list in actions_predecessors
-            ]
-            gs_val = min([1 + g for g in actions_predecessors_gs]) if len(actions_predecessors_gs) > 0 else self.depth
-            table[goal_atom_index] = gs_val
-            return gs_val
+    def forward_successors(self, state):
+        """Returns the (action index, state bitset) pairs of the actions applicable in the state bitset"""
+        return [(a, self.grounding.apply(state, a)) for a in self.grounding.applicable(state)]
 
-    def compute_heuristic(self, state, mode='h_max'):
-        """ Compute heuristic value for a given (state, action). """
-        assert mode in ('h_plus', 'h_max', 'zero')
-        if mode == 'zero':
-            return 0
-        values_table = {}
-        gs_values = [self.gs(self.rgp, state, max(self.rgp.nodes_indices[goal_atom_index]), values_table)
-                     for goal_atom_index in self.goal_state]
-        return sum(gs_values) if mode == 'plus' else max(gs_values)
+    def solve(self, mode='h_max', open_list='heap', tie_breaking='low_g', incremental=False, max_states=None,
+              memory_policy='spill', search='astar', weight=1, stop_event=None, direction='forward', deadline=None,
+              max_expansions=None, cost_bound=None):
+        """Applies the best-first search algorithm given by search ("astar", "wastar" with specified weight, "gbfs" or
+        "bfs", see SEARCHES) with specified heuristic to find a plan. States reached again through a cheaper
+        route are re-opened, the open list kind and tie breaking rule being given by open_list and tie_breaking. If
+        incremental, h_max and h_add values of the children are updated from the exploration of the expanded state.
+        If max_states is given, at most that many nodes are kept in memory following memory_policy (see
+        StateRegistry). With the sma policy, no plan longer than max_states can be found. The search gives up when
+        stop_event (a threading or multiprocessing Event) is set, at deadline (a time.perf_counter value) or after
+        max_expansions expansions. If cost_bound is given, only plans shorter than it are looked for: nodes which can
+        not lead to one (from their g value, and from their h value with an admissible heuristic) are pruned. The
+        direction is "forward" (progression from the initial state), "backward" (regression from the goals, see
+        Regression) or "bidirectional" (see _solve_bidirectional)"""
+        assert search in SEARCHES and direction in DIRECTIONS
+        if direction == 'bidirectional':
+            return self._solve_bidirectional(mode, open_list, tie_breaking, search, weight, stop_event, deadline,
+                                             max_expansions, cost_bound, max_states, memory_policy)
+        statistics, instrumentation = self.statistics, self.instrumentation
+        statistics.reset()
+        counters = statistics.counters
+        if self.unsolvable:
+            return 0, None
+        if memory_policy == 'sma' and max_states is not None:
+            tie_breaking = 'high_g'  # SMA* expands the deepest of the best nodes, or the bounded search may never dive
+        queue, final_state = make_open_list(open_list, tie_breaking), self.grounding.encode(self.goal_state)
+        if direction == 'forward':
+            root_state, is_goal = self.grounding.encode(self.initial_state), lambda state: includes(state, final_state)
+            successors, compute_heuristic = self.forward_successors, self.compute_heuristic
+        else:
+            root_state, is_goal = self.regression.root, self.regression.satisfied
+            successors, compute_heuristic = self.regression.successors, self.compute_regression_heuristic
+            incremental = False
+        push, pop = queue.push, queue.pop
+        if instrumentation is not None:
+            successors = instrumentation.timed(statistics, 'successors', successors)
+            compute_heuristic = instrumentation.timed(statistics, 'heuristic', compute_heuristic)
+            push = instrumentation.timed(statistics, 'queue', push)
+            pop = instrumentation.timed(statistics, 'queue', pop)
+            instrumentation.emit('start', statistics)
+        registry = StateRegistry(max_states, memory_policy)
+        root, _ = registry.insert(root_state, 0)
+        push(root, 0, 0, None)
+        backed_up_f, max_f = {}, -INFINITY  # Smallest f value of the forgotten children of a node, for sma
+        plan = None
+        try:
+            while not queue.is_empty():
+                if counters['expansions'] % 256 == 255:
+                    if self._interrupted(stop_event, deadline):
+                        break
+                    if instrumentation is not None:
+                        instrumentation.tick(statistics)
+                node, cost, g, _ = pop()
+                if cost > max_f:
+                    max_f = cost
+                    statistics.f_progression.append((counters['expansions'], cost))
+                    if instrumentation is not None:
+                        instrumentation.emit('f_value', statistics)
+                active_state = registry.state(node)
+                if is_goal(active_state):
+                    path = registry.path(node)
+                    plan = tuple(self.grounding.actions[a] for a in (path if direction == 'forward' else path[::-1]))
+                    break
+                if counters['expansions'] == max_expansions:
+                    break
+                if cost_bound is not None and g + 1 >= cost_bound:
+                    continue  # Its children can not be on a plan shorter than cost_bound
+                counters['expansions'] += 1
+                registry.close(node)
+                backed_up_f.pop(node, None)
+                parent = (active_state, self.exploration_table(active_state, mode)) \
+                    if incremental and mode in INCREMENTAL_HEURISTICS and self.heuristic.worth_updating() else None
+                for action_index, new_state in successors(active_state):
+                    counters['generations'] += 1
+                    nb_nodes = registry.count
+                    child, improved = registry.insert(new_state, g + 1, node, action_index)
+                    if not improved:
+                        counters['duplicates'] += 1
+                        continue
+                    counters['reopenings'] += registry.count == nb_nodes  # Already reached state, for a smaller g
+                    counters['heuristic_calls'] += search != 'bfs'
+                    h = 0 if search == 'bfs' else compute_heuristic(new_state, mode=mode, parent=parent)
+                    new_cost = SEARCHES[search](g + 1, h, weight)
+                    if new_cost == INFINITY:
+                        counters['dead_ends'] += 1
+                        continue  # Dead end, the goal can not be reached even in the relaxed problem
+                    if cost_bound is not None and mode in ADMISSIBLE_HEURISTICS and g + 1 + h >= cost_bound:
+                        continue
+                    if memory_policy == 'sma':
+                        new_cost = max(new_cost, cost)  # Pathmax, children of a re-opened node keep its backed f
+                    push(child, new_cost, g + 1, None)
+                if memory_policy == 'sma' and registry.is_full():
+                    counters['forgotten'] += self._forget_worst_leaves(registry, queue, backed_up_f, node)
+            return len(registry), plan
+        finally:
+            registry.close_store()
+            statistics.end = time.perf_counter()
+            if instrumentation is not None:
+                if plan is not None:
+                    instrumentation.emit('solution', statistics)
+                instrumentation.emit('end', statistics)
 
-    def solve(self, mode='h_max'):
-        """Applies the A* algorithm with specified heuristic to find a plan"""
+    def _solve_bidirectional(self, mode, open_list, tie_breaking, search, weight, stop_event, deadline,
+                             max_expansions, cost_bound, max_states, memory_policy):
+        """Runs a forward and a backward best-first search at the same time, always expanding a node of the frontier
+        with the fewest open nodes, until a forward state satisfies a backward subgoal (see MeetingIndex). The plan
+        is then the forward path to the state followed by the backward path from the subgoal. As the search stops at
+        the first meeting point, the plan is not guaranteed to be optimal, even with A*. With a cost_bound, nodes are
+        pruned as in solve and only meeting points on plans shorter than it are kept. Each frontier, and each side of
+        the meeting index, keeps at most max_states nodes in memory with the spill policy, the sma policy being
+        unsupported (a forgotten node would have to leave the meeting index too)"""
+        assert max_states is None or memory_policy == 'spill', 'the bidirectional search only supports spill'
+        statistics, instrumentation = self.statistics, self.instrumentation
+        statistics.reset()
+        counters = statistics.counters
         if self.unsolvable:
             return 0, None
-        weighted_queue, final_state, processed_states = WeightedQueue(), self.goal_state, set()
-        weighted_queue.insert(0, (self.initial_state, ()))
-        while not weighted_queue.is_empty():
-            cost, (active_state, past_actions) = weighted_queue.pop()
-            if active_state.issuperset(final_state):
-                return len(processed_states), past_actions
-            possible_actions = self.operators_manager.get_applicable_actions(active_state)
-            for action in possible_actions:
-                new_state = (active_state - action['effect_neg']) | action['effect_pos']
-                new_state_hash = hash(frozenset(new_state))
-                if new_state_hash not in processed_states:
-                    new_cost = len(past_actions) + 1 + self.compute_heuristic(new_state, mode=mode)
-                    weighted_queue.insert(new_cost, (new_state, past_actions + (action,)))
-                    processed_states.update({new_state_hash})
-        return len(processed_states), None
+        meetings = MeetingIndex(self.regression, cost_bound, max_states)
+        frontiers = {}  # direction -> (registry, open list, successors, heuristic, meeting index insertion, push, pop)
+        for direction, successors, compute_heuristic, add in (
+                ('forward', self.forward_successors, self.compute_heuristic, meetings.add_state),
+                ('backward', self.regression.successors, self.compute_regression_heuristic, meetings.add_subgoal)):
+            queue = make_open_list(open_list, tie_breaking)
+            push, pop = queue.push, queue.pop
+            if instrumentation is not None:
+                successors = instrumentation.timed(statistics, 'successors', successors)
+                compute_heuristic = instrumentation.timed(statistics, 'heuristic', compute_heuristic)
+                push = instrumentation.timed(statistics, 'queue', push)
+                pop = instrumentation.timed(statistics, 'queue', pop)
+            frontiers[direction] = (StateRegistry(max_states, memory_policy), queue, successors, compute_heuristic, add,
+                                    push, pop)
+        if instrumentation is not None:
+            instrumentation.emit('start', statistics)
+        meeting, max_f = None, -INFINITY  # (forward node, backward node)
+        for direction, root_state in (('forward', self.regression.initial_state), ('backward', self.regression.root)):
+            registry, _, _, _, add, push, _ = frontiers[direction]
+            root, _ = registry.insert(root_state, 0)
+            push(root, 0, 0, None)
+            other = add(root_state, root)
+            if other is not None:
+                meeting = (root, other) if direction == 'forward' else (other, root)
+        try:
+            while meeting is None and not any(frontier[1].is_empty() for frontier in frontiers.values()):
+                if counters['expansions'] % 256 == 255:
+                    if self._interrupted(stop_event, deadline):
+                        break
+                    if instrumentation is not None:
+                        instrumentation.tick(statistics)
+                if counters['expansions'] == max_expansions:
+                    break
+                direction = min(frontiers, key=lambda d: len(frontiers[d][1]))
+                registry, _, successors, compute_heuristic, add, push, pop = frontiers[direction]
+                node, cost, g, _ = pop()
+                if cost > max_f:
+                    max_f = cost
+                    statistics.f_progression.append((counters['expansions'], cost))
+                    if instrumentation is not None:
+                        instrumentation.emit('f_value', statistics)
+                if cost_bound is not None and g + 1 >= cost_bound:
+                    continue
+                counters['expansions'] += 1
+                registry.close(node)
+                for action_index, new_state in successors(registry.state(node)):
+                    counters['generations'] += 1
+                    nb_nodes = registry.count
+                    child, improved = registry.insert(new_state, g + 1, node, action_index)
+                    if not improved:
+                        counters['duplicates'] += 1
+                        continue
+                    counters['reopenings'] += registry.count == nb_nodes
+                    counters['heuristic_calls'] += search != 'bfs'
+                    h = 0 if search == 'bfs' else compute_heuristic(new_state, mode=mode)
+                    new_cost = SEARCHES[search](g + 1, h, weight)
+                    if new_cost == INFINITY:
+                        counters['dead_ends'] += 1
+                        continue
+                    if cost_bound is not None and mode in ADMISSIBLE_HEURISTICS and g + 1 + h >= cost_bound:
+                        continue
+                    push(child, new_cost, g + 1, None)
+                    other = add(new_state, child, g + 1)  # Again if reached for cheaper, for the cost_bound
+                    if other is not None:
+                        meeting = (child, other) if direction == 'forward' else (other, child)
+                        break
+            nb_nodes = len(frontiers['forward'][0]) + len(frontiers['backward'][0])
+            if meeting is None:
+                return nb_nodes, None
+            path = frontiers['forward'][0].path(meeting[0]) + frontiers['backward'][0].path(meeting[1])[::-1]
+            return nb_nodes, tuple(self.grounding.actions[a] for a in path)
+        finally:
+            [frontier[0].close_store() for frontier in frontiers.values()]
+            meetings.close_store()
+            statistics.end = time.perf_counter()
+            if instrumentation is not None:
+                if meeting is not None:
+                    instrumentation.emit('solution', statistics)
+                instrumentation.emit('end', statistics)
 
-    def display_plan(self, plan):
-        """Given a plan computed by self.solve, prints the detail of its functioning"""
-        nb_steps, actions = plan
-        if plan is None:
-            print('No plan found')
-        else:
-            print('Plan of length ' + str(len(actions)) + ' found in ' + str(nb_steps) + ' node explorations:')
-            state = set(self.initial_state)
-            for action in actions:
-                print('    current state: ' + str(state))
-                print(action['name'] + ': ')
-                print('    needs: ' + str(set(action['precond_pos'])))
-                print('    incompatible with: ' + str(set(action['precond_neg'])))
-                print('    positive effects: ' + str(set(action['effect_pos'])))
-                print('    negative effects: ' + str(set(action['effect_neg'])))
-                state = (state - action['effect_neg']) | action['effect_pos']
-            print('final state: ' + str(state))
-            print('goal: ' + str(set(self.goal_state)))
-            print('Objective completed !')
+    def iter_plans(self, mode='h_add', schedule=ANYTIME_SCHEDULE, time_limit=None, max_expansions=None,
+                   stop_event=None, **solve_kwargs):
+        """Anytime search, restarting weighted A* style: runs the (search, weight) pairs of the schedule in turn, each
+        search only looking for plans shorter than the best one found so far (see the cost_bound of solve), and
+        yields the (number of explored nodes, actions) result of each improving plan as soon as it is found. The whole
+        run is bounded by time_limit seconds and max_expansions expansions. It ends early when a search of the
+        schedule proves that no shorter plan exists, by exhausting its bounded search space. Searches with a non
+        integer weight use the heap open list, whatever the open_list argument"""
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        best, nb_expansions = None, 0
+        for search, weight in schedule:
+            budget = None if max_expansions is None else max_expansions - nb_expansions
+            if budget == 0 or self._interrupted(stop_event, deadline) or best is not None and len(best) == 0:
+                return
+            nb_nodes, plan = self.solve(mode=mode, search=search, weight=weight, stop_event=stop_event,
+                                        deadline=deadline, max_expansions=budget,
+                                        cost_bound=None if best is None else len(best),
+                                        **{**solve_kwargs, **({} if weight == int(weight) else {'open_list': 'heap'})})
+            nb_expansions += self.statistics.counters['expansions']
+            if plan is not None and (best is None or len(plan) < len(best)):
+                best = plan
+                yield nb_nodes, plan
+            elif plan is None and best is not None and self.statistics.counters['expansions'] != budget and \
+                    not self._interrupted(stop_event, deadline) and solve_kwargs.get('max_states') is None:
+                return  # The search space bounded by the best plan has been exhausted, so it is optimal
+
+    def solve_anytime(self, mode='h_add', callback=None, **kwargs):
+        """Runs iter_plans (with the same arguments), calling callback(nb_nodes, actions) on each improving plan, and
+        returns the last result (the best plan found), or (0, None) if none has been found"""
+        result = (0, None)
+        for result in self.iter_plans(mode, **kwargs):
+            if callback is not None:
+                callback(*result)
+        return result
+
+    @staticmethod
+    def _interrupted(stop_event, deadline):
+        """Returns True if the search must give up, stop_event being set or deadline being passed"""
+        return stop_event is not None and stop_event.is_set() or deadline is not None and time.perf_counter() > deadline
+
+    @staticmethod
+    def _forget_worst_leaves(registry, queue, backed_up_f, expanded):
+        """SMA* memory policy: forgets the open leaves with the greatest f values (shallowest first) until the registry
+        is back within its bound, except the children of the node just expanded, and returns their number. The parent
+        of a forgotten leaf is opened again with the smallest f of its forgotten children, so that the forgotten
+        subtree is generated again if it becomes promising"""
+        nb_to_forget, nb_forgotten = len(registry.nodes) - registry.max_states, 0
+        for node, f in queue.worst(2 * nb_to_forget):
+            parent = registry.parent(node)
+            if nb_to_forget <= 0 or parent in (None, expanded) or registry.nb_children(node) > 0:
+                continue
+            queue.remove(node)
+            registry.forget(node)
+            backed_up_f.pop(node, None)
+            backed_up_f[parent] = min(backed_up_f.get(parent, INFINITY), f)
+            if parent not in queue:
+                registry.reopen(parent)
+                queue.push(parent, backed_up_f[parent], registry.g(parent), None)
+            nb_to_forget -= 1
+            nb_forgotten += 1
+        return nb_forgotten
+
+    def display_plan(self, plan, stream=None):
+        """Given a plan computed by self.solve, prints its steps with their effects (see plan_output.print_plan)"""
+        print_plan(self, plan, stream)
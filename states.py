@@ -0,0 +1,42 @@
+class AtomTable:
+    """Interns ground atoms as consecutive integer ids, so that a state can be stored as a bitset: a python int whose
+    i-th bit is set when the atom of id i holds. Set operations on states then become bitwise operations on ints"""
+    def __init__(self, atoms=()):
+        self.atoms = []  # id to atom
+        self.ids = {}  # atom to id
+        [self.intern(atom) for atom in sorted(atoms)]  # Sorted so that ids do not depend on the hash seed
+
+    def intern(self, atom):
+        """Returns the id of specified atom, and gives it a new one if it is unknown yet"""
+        atom_id = self.ids.get(atom)
+        if atom_id is None:
+            atom_id = self.ids[atom] = len(self.atoms)
+            self.atoms.append(atom)
+        return atom_id
+
+    def encode(self, atoms):
+        """Returns the bitset of a set of atoms"""
+        bits = 0
+        for atom in atoms:
+            bits |= 1 << self.intern(atom)
+        return bits
+
+    def decode(self, bits):
+        """Returns the set of atoms of a bitset"""
+        return frozenset(self.atoms[i] for i in iter_ids(bits))
+
+    def __len__(self):
+        return len(self.atoms)
+
+
+def iter_ids(bits):
+    """Yields the ids of the atoms set in specified bitset, in increasing order"""
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+def includes(bits, sub_bits):
+    """Returns True if all atoms of sub_bits are set in bits"""
+    return bits & sub_bits == sub_bits
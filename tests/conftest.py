@@ -0,0 +1,11 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples-pddl')
+
+
+def example(number):
+    """Returns the (domain, problem) paths of an example of examples-pddl"""
+    return (os.path.join(EXAMPLES, 'domain-' + number + '.pddl'), os.path.join(EXAMPLES, 'problem-' + number + '.pddl'))
@@ -0,0 +1,75 @@
+from conftest import example
+from parsing import load_task, Task, OperatorSchema
+from operators import OperatorsManager
+from grounding import GroundActions
+from states import iter_ids, includes
+import pytest
+
+
+def breadth_first_plan_length(grounding, task):
+    """Returns the length of the shortest plan over the ground actions, or None if there is none"""
+    goal = grounding.encode(task.goal_state)
+    layer, seen, depth = [grounding.encode(task.initial_state)], set(), 0
+    seen.update(layer)
+    while layer:
+        if any(includes(state, goal) for state in layer):
+            return depth
+        children = [grounding.apply(state, a) for state in layer for a in grounding.applicable(state)]
+        layer = [child for child in set(children) if child not in seen]
+        seen.update(layer)
+        depth += 1
+    return None
+
+
+def ground(task, prune=True):
+    return GroundActions(OperatorsManager(task), task.initial_state, task.goal_state, prune)
+
+
+def kept_atoms(grounding):
+    return {grounding.atoms.atoms[i] for i in iter_ids(grounding.mask)}
+
+
+@pytest.mark.parametrize('number', ['01', '03', '04', '05'])
+def test_pruning_keeps_optimal_plan_length(number):
+    task = load_task(*example(number))
+    pruned, unpruned = ground(task), ground(task, prune=False)
+    assert pruned.pruning['actions'][1] <= pruned.pruning['actions'][0] == len(unpruned.actions)
+    assert breadth_first_plan_length(pruned, task) == breadth_first_plan_length(unpruned, task) is not None
+
+
+def test_static_predicates():
+    assert ground(load_task(*example('02'))).pruning['static_predicates'] == ['adjacent', 'attached', 'belong']
+
+
+def schema(name, variables, pre_pos=(), pre_neg=(), effect_pos=(), effect_neg=()):
+    return OperatorSchema(name, {var: 'loc' for var in variables},
+                          *map(frozenset, (pre_pos, pre_neg, effect_pos, effect_neg)))
+
+
+def test_pruned_actions_and_atoms():
+    """A robot painting l3 on a line of locations, l4 being broken and out of reach. Ringing the bell of a location
+    never helps, and priming needs an unsealed location while all are sealed, so spraying needs a primer which never
+    holds"""
+    operators = [
+        schema('move', ('?a', '?b'), [('at', '?a'), ('link', '?a', '?b')], [('broken', '?b')], [('at', '?b')],
+               [('at', '?a')]),
+        schema('light', ('?a',), [('at', '?a')], effect_pos=[('lit', '?a')]),
+        schema('paint', ('?a',), [('at', '?a'), ('lit', '?a')], effect_pos=[('painted', '?a')]),
+        schema('ring', ('?a',), [('at', '?a')], effect_pos=[('rung', '?a')]),
+        schema('prime', ('?a',), [('at', '?a')], [('sealed', '?a')], [('primed', '?a')]),
+        schema('spray', ('?a',), [('primed', '?a')], effect_pos=[('painted', '?a')]),
+    ]
+    locations = ('l1', 'l2', 'l3', 'l4')
+    links = list(zip(locations, locations[1:]))
+    initial_state = [('at', 'l1'), ('broken', 'l4')] + [('sealed', l) for l in locations] + \
+        [('link', a, b) for a, b in links] + [('link', b, a) for a, b in links]
+    task = Task({l: 'loc' for l in locations}, {op.operator_name: op for op in operators}, initial_state,
+                [('painted', 'l3')])
+    pruned, unpruned = ground(task), ground(task, prune=False)
+    names = {action['name'] for action in pruned.actions}
+    assert {action['name'] for action in unpruned.actions} - names == {'ring', 'prime', 'spray'}
+    assert not any(action['name'] == 'move' and action['vars']['?b'] == 'l4' for action in pruned.actions)
+    assert any(action['name'] == 'move' and action['vars']['?b'] == 'l4' for action in unpruned.actions)
+    assert not {atom[0] for atom in kept_atoms(pruned)} & {'rung', 'primed', 'sealed', 'link', 'broken'}
+    assert pruned.pruning['static_predicates'] == ['broken', 'link', 'sealed']
+    assert breadth_first_plan_length(pruned, task) == breadth_first_plan_length(unpruned, task) == 4
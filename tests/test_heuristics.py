@@ -0,0 +1,45 @@
+from conftest import example
+from parsing import load_task
+from solver import Solver
+import random
+import pytest
+
+
+@pytest.fixture(scope='module')
+def solver():
+    return Solver(load_task(*example('02')))
+
+
+def random_transitions(solver, nb_transitions, seed=0):
+    """Returns (parent state, child state) bitsets pairs along a random walk from the initial state"""
+    generator, state, transitions = random.Random(seed), solver.grounding.encode(solver.initial_state), []
+    for _ in range(nb_transitions):
+        _, child = generator.choice(solver.forward_successors(state))
+        transitions.append((state, child))
+        state = child
+    return transitions
+
+
+@pytest.mark.parametrize('mode', ['h_max', 'h_add'])
+@pytest.mark.parametrize('max_update_ratio', [0.25, 1])
+def test_incremental_matches_full_evaluation(solver, mode, max_update_ratio):
+    heuristic = solver.heuristic
+    heuristic.max_update_ratio = max_update_ratio
+    for parent, child in random_transitions(solver, 200):
+        value, table = heuristic.evaluate_incremental(parent, heuristic.table(parent, mode), child, mode)
+        assert value == heuristic.evaluate(child, mode)
+        costs, _, action_costs = heuristic.table(child, mode)
+        assert table[0] == costs and table[2] == action_costs  # Best supporters may differ between ties
+
+
+@pytest.mark.parametrize('mode, search', [('h_add', 'astar'), ('h_max', 'gbfs')])
+def test_incremental_search(mode, search):
+    """The incremental search expands the same nodes, the tables of the expanded states coming from their evaluation"""
+    task = load_task(*example('02'))
+    plans = []
+    for incremental in (False, True):
+        solver = Solver(task)
+        plans.append(solver.solve(mode=mode, search=search, incremental=incremental))
+        if incremental:
+            assert solver.tables.hits > 0
+    assert plans[0] == plans[1]
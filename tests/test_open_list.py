@@ -0,0 +1,111 @@
+from open_list import make_open_list, TIE_BREAKINGS
+import random
+import pytest
+
+
+KINDS = ('heap', 'bucket')
+
+
+def pop_all(queue):
+    popped = []
+    while not queue.is_empty():
+        popped.append(queue.pop())
+    return popped
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_pops_by_f(kind):
+    queue = make_open_list(kind)
+    for key, f in enumerate([5, 3, 8, 3, 1]):
+        assert queue.push(key, f, 0, None)
+    assert len(queue) == 5 and 2 in queue
+    assert [f for _, f, _, _ in pop_all(queue)] == [1, 3, 3, 5, 8]
+    assert len(queue) == 0 and 2 not in queue
+
+
+@pytest.mark.parametrize('kind', KINDS)
+@pytest.mark.parametrize('tie_breaking, expected', [
+    ('low_g', ['c', 'a', 'b']), ('high_g', ['b', 'a', 'c']), ('fifo', ['a', 'b', 'c']), ('lifo', ['c', 'b', 'a']),
+])
+def test_tie_breaking(kind, tie_breaking, expected):
+    queue = make_open_list(kind, tie_breaking)
+    for key, g in (('a', 2), ('b', 3), ('c', 1)):
+        queue.push(key, 4, g, None)
+    assert [key for key, _, _, _ in pop_all(queue)] == expected
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_decrease_key(kind):
+    queue = make_open_list(kind)
+    queue.push('a', 6, 4, 'first')
+    queue.push('b', 5, 0, None)
+    assert not queue.push('a', 2, 5, 'ignored')  # Not a smaller g
+    assert queue.push('a', 3, 1, 'second')
+    assert len(queue) == 2
+    assert pop_all(queue) == [('a', 3, 1, 'second'), ('b', 5, 0, None)]  # The replaced entry is never popped
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_lazy_deletion(kind):
+    queue = make_open_list(kind)
+    for key in range(4):
+        queue.push(key, key, 0, None)
+    assert queue.remove(0) and queue.remove(2)
+    assert queue.remove(5)  # Not open
+    assert not queue.remove(1, g=0)  # Kept, its g value is not greater
+    assert len(queue) == 2 and 0 not in queue
+    assert [key for key, _, _, _ in pop_all(queue)] == [1, 3]
+    queue.push(0, 0, 0, None)  # Opened again after its removal
+    assert queue.pop()[0] == 0 and queue.is_empty()
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_pop_empty(kind):
+    queue = make_open_list(kind)
+    with pytest.raises(IndexError):
+        queue.pop()
+    queue.push('a', 3, 0, None)
+    queue.push('b', 5, 0, None)
+    queue.remove('a')
+    queue.remove('b')
+    with pytest.raises(IndexError):  # Only dead entries are left
+        queue.pop()
+    queue.push('c', 1, 0, None)  # Below the f values seen so far
+    queue.push('d', 2, 0, None)
+    queue.remove('d')
+    assert queue.pop() == ('c', 1, 0, None)
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_worst(kind):
+    queue = make_open_list(kind)
+    for key, (f, g) in enumerate([(2, 0), (7, 3), (7, 1), (4, 0)]):
+        queue.push(key, f, g, None)
+    assert queue.worst(3) == [(2, 7), (1, 7), (3, 4)]  # Lowest g first among ties
+
+
+@pytest.mark.parametrize('kind', KINDS)
+@pytest.mark.parametrize('tie_breaking', TIE_BREAKINGS)
+def test_random_operations(kind, tie_breaking):
+    """Interleaved pushes, decrease-keys, removals and pops give the same pops as a sorted reference"""
+    generator, queue, reference, count = random.Random(0), make_open_list(kind, tie_breaking), {}, 0
+    tie = {'low_g': lambda g, c: g, 'high_g': lambda g, c: -g, 'fifo': lambda g, c: c, 'lifo': lambda g, c: -c}
+    for _ in range(2000):
+        operation, key = generator.random(), generator.randrange(50)
+        if operation < 0.6:
+            f, g = generator.randrange(20), generator.randrange(10)
+            pushed = key not in reference or g < reference[key][2]
+            assert queue.push(key, f, g, None) == pushed
+            if pushed:
+                reference[key], count = (f, tie[tie_breaking](g, count), g, count), count + 1
+        elif operation < 0.7:
+            queue.remove(key)
+            reference.pop(key, None)
+        elif reference:
+            best = min(reference, key=lambda k: (reference[k][0], reference[k][1], reference[k][3]))
+            key, f, g, _ = queue.pop()
+            assert (key, f, g) == (best, reference[best][0], reference[best][2])
+            del reference[key]
+        assert len(queue) == len(reference)
@@ -0,0 +1,59 @@
+from conftest import example
+from parsing import load_task
+from operators import OperatorsManager
+from utils import invert_dict
+import itertools as itt
+import random
+import pytest
+
+
+def brute_force_assignations(cell, statements, relaxed=False):
+    """Reference binder: enumerates every assignation of the variables of the preconditions to objects of their type
+    and keeps the ones meeting the preconditions, as {variable: value} dicts"""
+    types_to_objects = invert_dict(cell.task.objects)
+    variables = sorted(var for var in cell.vars_pos | cell.vars_neg if var[0] == '?')
+    domains = [sorted(types_to_objects.get(cell.op.variable_list[var], ())) for var in variables]
+    assignations = set()
+    for values in itt.product(*domains):
+        assignation = dict(zip(variables, values))
+        ground = lambda args: tuple(assignation.get(a, a) for a in args)
+        if all((name, *ground(args)) in statements for name, args_set in cell.i_pos.items() for args in args_set) and \
+                (relaxed or not any((name, *ground(args)) in statements
+                                    for name, args_set in cell.i_neg.items() for args in args_set)):
+            assignations.add(frozenset(assignation.items()))
+    return assignations
+
+
+def sample_states(manager, initial_state, nb_states, seed=0):
+    """Returns the states of random walks from the initial state, restarting when no action applies"""
+    generator, state, states = random.Random(seed), frozenset(initial_state), []
+    for _ in range(nb_states):
+        states.append(state)
+        actions = manager.get_applicable_actions(state)
+        if not actions:
+            state = frozenset(initial_state)
+            continue
+        action = generator.choice(actions)
+        state = (state - action['effect_neg']) | action['effect_pos']
+    return states
+
+
+@pytest.mark.parametrize('number', ['01', '02', '03', '04', '05'])
+def test_join_matches_brute_force(number):
+    task = load_task(*example(number))
+    manager = OperatorsManager(task)
+    states = sample_states(manager, task.initial_state, 100)
+    backward_actions, _ = manager._build_actions_and_mapper(False)
+    for cell, state in itt.product(manager.forward_actions + backward_actions, states):
+        for relaxed in (False, True):
+            joined = {frozenset((var, val) for var, val in assignation.items() if var[0] == '?')
+                      for assignation in cell.get_possible_assignations(state, relaxed)}
+            assert joined == brute_force_assignations(cell, state, relaxed), (cell.op_name, cell.forward, relaxed)
+
+
+def test_join_is_deterministic():
+    task = load_task(*example('02'))
+    manager = OperatorsManager(task)
+    assert manager.get_applicable_actions(task.initial_state) == OperatorsManager(task).get_applicable_actions(
+        task.initial_state
+    )
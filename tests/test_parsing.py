@@ -0,0 +1,43 @@
+from conftest import example
+from parsing import parse, compile_task, compile_domain, compile_problem, load_task, read_task, task_key, \
+    TASK_FORMAT_VERSION
+import pickle
+import pytest
+
+
+@pytest.mark.parametrize('number', ['01', '02', '03', '04', '05'])
+def test_compile_problem_matches_compile_task(number):
+    domain, problem = example(number)
+    assert compile_problem(compile_domain(domain), problem).to_data() == compile_task(parse(domain, problem)).to_data()
+
+
+def test_task_file_round_trip(tmp_path):
+    domain, problem = example('02')
+    task = load_task(domain, problem, str(tmp_path))
+    path = tmp_path / (task_key(domain, problem) + '.task')
+    assert path.exists() and read_task(str(path)).to_data() == task.to_data()
+    assert load_task(domain, problem, str(tmp_path)).to_data() == compile_task(parse(domain, problem)).to_data()
+
+
+def test_task_key_follows_contents(tmp_path):
+    domain, problem = example('03')
+    copies = [tmp_path / 'domain.pddl', tmp_path / 'problem.pddl']
+    for source, copy in zip((domain, problem), copies):
+        copy.write_bytes(open(source, 'rb').read())
+    assert task_key(*map(str, copies)) == task_key(domain, problem) != task_key(*example('04'))
+    copies[1].write_bytes(copies[1].read_bytes() + b'\n')
+    assert task_key(*map(str, copies)) != task_key(domain, problem)
+
+
+@pytest.mark.parametrize('contents', [
+    b'', b'not a pickle', pickle.dumps([1, 2]), pickle.dumps({'version': TASK_FORMAT_VERSION}),
+    pickle.dumps({'version': TASK_FORMAT_VERSION - 1}),
+    b'cmissing_module\nTask\n.',  # Class of a module which can not be imported
+])
+def test_bad_task_files_are_misses(tmp_path, contents):
+    domain, problem = example('03')
+    path = tmp_path / (task_key(domain, problem) + '.task')
+    path.write_bytes(contents)
+    assert read_task(str(path)) is None
+    assert load_task(domain, problem, str(tmp_path)).to_data() == compile_task(parse(domain, problem)).to_data()
+    assert read_task(str(path)) is not None  # Written again
@@ -0,0 +1,50 @@
+from conftest import example
+from parsing import load_task
+from plan_output import save_plan, validate_plan
+from solver import Solver
+import json
+import pytest
+
+
+@pytest.fixture(scope='module')
+def solved():
+    solver = Solver(load_task(*example('03')))
+    _, plan = solver.solve(mode='h_add')
+    return solver, plan
+
+
+def test_ipc_format(solved, tmp_path):
+    solver, plan = solved
+    path = str(tmp_path / 'plan.plan')
+    assert save_plan(solver, plan, path) == len(plan)
+    lines = open(path).read().splitlines()
+    assert lines[-1] == '; cost = ' + str(len(plan)) + ' (unit cost)'
+    # Arguments follow the parameters of the operator, not the order of the assignation
+    assert any(list(action['vars']) != list(solver.task.operators[action['name']].variable_list) for action in plan)
+    assert lines[:-1] == ['(' + ' '.join([action['name'], *[
+        action['vars'][param] for param in solver.task.operators[action['name']].variable_list
+    ]]) + ')' for action in plan]
+
+
+def test_jsonl_deltas(solved, tmp_path):
+    solver, plan = solved
+    path = str(tmp_path / 'plan.jsonl')
+    save_plan(solver, plan, path, deltas=True)
+    records = [json.loads(line) for line in open(path)]
+    assert [record['step'] for record in records] == list(range(len(plan)))
+    assert [record['action'] for record in records] == [action['name'] for action in plan]
+    state = set(solver.atoms.decode(solver.atoms.encode(solver.initial_state)))
+    for record in records:
+        added, deleted = {tuple(atom) for atom in record['added']}, {tuple(atom) for atom in record['deleted']}
+        assert not added & state and deleted <= state
+        state = (state - deleted) | added
+    assert set(solver.goal_state) <= state
+
+
+def test_validator_rejections(solved):
+    solver, plan = solved
+    assert validate_plan(solver, plan) == (True, None)
+    # Without loading the container first, unloading it is not applicable
+    assert validate_plan(solver, plan[1:]) == (False, "step 1 (unload): missing [('loaded', 'robq', 'contb')]")
+    valid, reason = validate_plan(solver, plan[:-1])
+    assert not valid and reason.startswith('goals not reached: ')
@@ -0,0 +1,91 @@
+from conftest import example
+from parsing import load_task
+from plan_output import validate_plan
+from registry import StateRegistry, MeetingIndex
+from solver import Solver
+import pytest
+
+
+def test_insert_and_duplicates():
+    registry = StateRegistry()
+    root, new = registry.insert(0b1, 0)
+    assert new and registry.lookup(0b1) == root
+    child, new = registry.insert(0b11, 1, root, 4)
+    assert new and registry.parent(child) == root and registry.nb_children(root) == 1
+    assert registry.insert(0b11, 1, root, 5) == (child, False)
+    assert registry.path(child) == [4] and len(registry) == 2
+
+
+def test_reopening_keeps_children():
+    registry = StateRegistry()
+    root, _ = registry.insert(0b1, 0)
+    a, _ = registry.insert(0b10, 1, root, 0)
+    b, _ = registry.insert(0b100, 2, a, 1)
+    c, _ = registry.insert(0b1000, 3, b, 2)
+    registry.close(b)
+    # b is reached again for cheaper, from root: it is open again and still the parent of c
+    assert registry.insert(0b100, 1, root, 3) == (b, True)
+    assert b not in registry.closed
+    assert registry.nb_children(b) == 1 and registry.nb_children(a) == 0 and registry.nb_children(root) == 2
+    assert registry.path(c) == [3, 2] and registry.g(b) == 1
+
+
+def test_forget():
+    registry = StateRegistry(max_states=1, policy='sma')
+    root, _ = registry.insert(0b1, 0)
+    child, _ = registry.insert(0b10, 1, root, 0)
+    assert registry.is_full()
+    registry.forget(child)
+    assert registry.lookup(0b10) is None and registry.nb_children(root) == 0 and not registry.is_full()
+    assert registry.insert(0b10, 1, root, 0) == (len(registry) - 1, True)  # Generated again with a new id
+
+
+def test_spill():
+    registry = StateRegistry(max_states=2, policy='spill')
+    root, _ = registry.insert(0b1, 0)
+    registry.close(root)
+    child, _ = registry.insert(0b10, 1, root, 0)
+    grandchild, _ = registry.insert(0b100, 2, child, 1)
+    assert root not in registry.nodes and registry.lookup(0b1) == root
+    assert registry.path(grandchild) == [0, 1] and registry.g(root) == 0
+    assert registry.insert(0b1, 3) == (root, False)
+    registry.close_store()
+
+
+@pytest.mark.parametrize('number, max_states', [('03', 5), ('03', 10), ('04', 5), ('04', 10)])
+def test_sma_with_reopenings(number, max_states):
+    """SMA* with a greedy search, where nodes having children in memory are reached again for cheaper"""
+    solver = Solver(load_task(*example(number)))
+    _, plan = solver.solve(mode='h_ff', search='gbfs', max_states=max_states, memory_policy='sma')
+    assert plan is not None and validate_plan(solver, plan) == (True, None)
+    assert solver.statistics.counters['forgotten'] > 0
+
+
+def breadth_first_nodes(root, successors, nb_nodes):
+    """Returns the first nb_nodes nodes of a breadth-first traversal from root"""
+    nodes, seen = [root], {root}
+    for node in nodes:
+        for _, child in successors(node):
+            if child not in seen and len(nodes) < nb_nodes:
+                nodes.append(child)
+                seen.add(child)
+    return nodes
+
+
+@pytest.mark.parametrize('number', ['03', '04'])
+def test_meeting_index_spill(number):
+    """A meeting index bounded to 2 states and 2 subgoals in memory finds the same meetings as an unbounded one"""
+    solver = Solver(load_task(*example(number)))
+    regression = solver.regression
+    states = breadth_first_nodes(regression.initial_state, solver.forward_successors, 40)
+    subgoals = breadth_first_nodes(regression.root, regression.successors, 40)
+    bounded, unbounded = MeetingIndex(regression, max_states=2), MeetingIndex(regression)
+    nb_meetings = 0
+    for node, (state, subgoal) in enumerate(zip(states, subgoals)):
+        for add, item in (('add_state', state), ('add_subgoal', subgoal)):
+            meeting = getattr(bounded, add)(item, node)
+            assert (meeting is None) == (getattr(unbounded, add)(item, node) is None)
+            nb_meetings += meeting is not None
+            assert len(bounded) <= 4
+    assert bounded.store is not None and nb_meetings > 0
+    bounded.close_store()
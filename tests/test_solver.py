@@ -0,0 +1,47 @@
+from conftest import example
+from parsing import load_task
+from plan_output import validate_plan
+from instrumentation import Instrumentation
+from solver import Solver, DIRECTIONS
+import pytest
+
+
+@pytest.fixture(scope='module')
+def solver():
+    return Solver(load_task(*example('03')))
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+@pytest.mark.parametrize('mode', ['h_max', 'h_add', 'h_ff', 'zero'])
+def test_directions(solver, direction, mode):
+    _, plan = solver.solve(mode=mode, direction=direction)
+    assert validate_plan(solver, plan) == (True, None)
+    if direction != 'bidirectional' and mode in ('h_max', 'zero'):
+        assert len(plan) == 4  # Admissible A*
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_instrumentation_events(direction):
+    events = []
+    solver = Solver(load_task(*example('03')), instrumentation=Instrumentation(
+        profile=True, callback=lambda event, statistics: events.append((event, statistics))
+    ))
+    solver.solve(mode='h_add', direction=direction)
+    assert events[0][0] == 'start' and [event for event, _ in events[-2:]] == ['solution', 'end']
+    assert events[-1][1]['counters']['expansions'] > 0 and events[-1][1]['phase_times']['successors'] > 0
+    assert events[-1][1]['caches']['heuristic']['misses'] == solver.cache.misses
+    assert set(events[-1][1]['caches']['tables']) == {'size', 'hits', 'misses', 'evictions', 'hit_rate'}
+
+
+def test_bidirectional_memory_policies(solver):
+    _, plan = solver.solve(mode='h_add', direction='bidirectional', max_states=2)
+    assert validate_plan(solver, plan) == (True, None)
+    with pytest.raises(AssertionError):
+        solver.solve(mode='h_add', direction='bidirectional', max_states=2, memory_policy='sma')
+
+
+def test_anytime_with_bucket_open_list(solver):
+    """Non integer weights of the schedule fall back to the heap open list"""
+    plans = list(solver.iter_plans(mode='h_add', schedule=(('wastar', 1.5), ('astar', 1)), open_list='bucket'))
+    assert len(plans) > 0 and len(plans[-1][1]) == 4
+    assert all(validate_plan(solver, plan) == (True, None) for _, plan in plans)
@@ -1,6 +1,5 @@
+from collections import OrderedDict
 from frozendict import frozendict
-import functools as fct
-import numpy as np
 
 
 # -------------------------------------------------------- DICTS -------------------------------------------------------
@@ -39,96 +38,119 @@ def invert_dict(d):
     return inv
 
 
-# --------------------------------------------------- WEIGHTED QUEUE ---------------------------------------------------
+# ------------------------------------------------------ LRU CACHE -----------------------------------------------------
 
 
-class WeightedQueue:
-    """Acts like a queue with weights that pops the smallest weighted elem first"""
-    def __init__(self):
-        self.weights = np.empty((0,))
-        self.values = {}
+class LRUCache:
+    """Bounded memoization table which evicts the least recently used entry when full (a max_size of None means no
+    bound, 0 disables the cache), and counts hits, misses and evictions"""
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.table = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
 
-    def insert(self, weight, value):
-        already_assigned = add_to_sets_dict(self.values, weight, value)
-        if not already_assigned:
-            self.weights = np.sort(np.concatenate([self.weights, [weight]]))
-
-    def pop(self):
-        w = self.weights[0]
-        values = list(self.values[w])
-        if len(values) == 1:
-            [val] = values
-            del self.values[w]
-            self.weights = self.weights[1:]
+    def get(self, key):
+        """Returns the value cached for key, or None"""
+        value = self.table.get(key)
+        if value is None:
+            self.misses += 1
         else:
-            val = values[int(np.random.randint(len(values)))]
-            self.values[w].discard(val)
-        return w, val
+            self.hits += 1
+            self.table.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.max_size == 0:
+            return
+        self.table[key] = value
+        self.table.move_to_end(key)
+        if self.max_size is not None and len(self.table) > self.max_size:
+            self.table.popitem(last=False)
+            self.evictions += 1
 
-    def is_empty(self):
-        return len(self.weights) == 0
+    def stats(self):
+        """Returns the counters of the cache and its hit rate"""
+        nb_requests = self.hits + self.misses
+        return {"size": len(self.table), "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / nb_requests if nb_requests > 0 else 0.}
+
+    def clear(self):
+        self.table.clear()
 
 
 # ----------------------------------------------- VARIABLES ASSIGNATION ------------------------------------------------
 
 
-class VariablesAssign:
-    """Given known var names and consecutive possible partial assignations of these variables (some can be mutually
-    exclusive), returns all the possibilities to assign a value to every known variable"""
+class RelationalJoin:
+    """Computes the variables assignations of an operator which satisfy its preconditions in a set of statements, the
+    way relational databases answer a conjunctive query. Each positive precondition is a relation over its variables,
+    filled from the statements of its predicate, and the relations are hash joined one at a time (the next one being
+    the smallest relation sharing a variable with the ones already joined). Negative preconditions are checked as
+    soon as all their variables are bound, so variables only appearing in them (whose values are taken among the
+    domains of neg_domains) never give rise to a full cross product. Constants are handled as variables which can only
+    take their own name as value. Assignations are returned in sorted order, so the result is deterministic"""
+
+    def __init__(self, pos_patterns, neg_patterns, neg_domains):
+        # Patterns are {predicate name: {variables and constants tuple, ...}} dicts
+        self.pos = sorted((name, args) for name, args_set in pos_patterns.items() for args in args_set)
+        self.neg = sorted((name, args) for name, args_set in neg_patterns.items() for args in args_set)
+        self.constants = tuple(sorted({a for _, args in self.pos + self.neg for a in args if a[0] != '?'}))
+        self.neg_domains = sorted((var, sorted(values)) for var, values in neg_domains.items() if var[0] == '?')
 
-    def __init__(self, var_names):
-        self.var_names = frozenset(var_names)
-        self.nb_vars = len(self.var_names)
-        self.tree = {}  # The tree used for this application is a nested dictionary
-        
     @staticmethod
-    def _compatible_trees_and_full_inclusion(tree, assignation):
-        """Given a tree and a partial assignation, returns all the sub-trees which root label are compatible with said
-        assignation, and returns the only one that is completely contained in assignation if it exists (which is
-        specified by the full_inclusion boolean)"""
-        compatible_trees, full_inclusion = set(), False
-        for p_assign in tree.keys():
-            matching = [assignation[var] == val for var, val in p_assign.items() if var in assignation.keys()]
-            if all(matching):
-                if len(matching) == len(p_assign):
-                    full_inclusion = True
-                    compatible_trees = [p_assign]
-                    break
-                compatible_trees |= {p_assign}
-        return compatible_trees, full_inclusion
-
-    def _update_tree(self, cache, tree, assignation):
-        """Pushes a new variables assignation into the current tree and returns all (possibly none) total assignations
-        found in the process"""
-        if len(assignation) == 0:
-            return {frozendict(cache)} if len(cache) == self.nb_vars else set()
-        elif len(assignation) == self.nb_vars:
-            return {assignation}
-
-        compatible_trees, full_inclusion = self._compatible_trees_and_full_inclusion(tree, assignation)
-        if not full_inclusion:
-            tree.update({assignation: {}})
-            compatible_trees |= {assignation}
-
-        result = fct.reduce(lambda x, y: x | y, [
-            self._update_tree(
-                {**cache, **p_assign}, tree[p_assign],
-                frozendict({var: assignation[var] for var in assignation.keys() if var not in p_assign.keys()}))
-            for p_assign in compatible_trees
-        ], set())
-        return result
-
-    def process_assignations(self, assignations):
-        """Uses input assignations in a random order to determine all possible total variables assignation they allow"""
-        full_assignations = set()
-        for i in np.random.permutation(len(assignations)):
-            p_assign = assignations[i]
-            if all([True if var in self.var_names else p_assign[var] == var for var in p_assign.keys()]):
-                full_assignations |= self._update_tree(
-                    {}, self.tree, frozendict({var: p_assign[var] for var in p_assign.keys() & self.var_names})
-                )
-        return full_assignations
-
-    def reset(self):
-        """Resets tree"""
-        self.tree = {}
+    def _relation(args, values_list):
+        """Returns the variables of a pattern (in order of first appearance) and the set of the values they take in
+        the matching statements"""
+        variables = tuple(dict.fromkeys(a for a in args if a[0] == '?'))
+        rows = set()
+        for values in values_list:
+            binding = {}
+            if len(values) == len(args) and all(val == a if a[0] != '?' else binding.setdefault(a, val) == val
+                                                for a, val in zip(args, values)):
+                rows.add(tuple(binding[var] for var in variables))
+        return variables, rows
+
+    def _check_negatives(self, order, bindings, negatives, statements):
+        """Filters the bindings with the negative preconditions whose variables are all bound, and returns the
+        remaining negative preconditions"""
+        positions = {var: i for i, var in enumerate(order)}
+        ready = [(name, args) for name, args in negatives if all(a in positions for a in args)]
+        if ready:
+            bindings = [b for b in bindings if not any(
+                (name, *(b[positions[a]] for a in args)) in statements for name, args in ready
+            )]
+        return bindings, [pattern for pattern in negatives if pattern not in ready]
+
+    def assignations(self, statements, relaxed=False):
+        """Returns the sorted list of the assignations (as {variable or constant: value} frozendicts) whose positive
+        preconditions are all in statements and whose negative preconditions are not (unless relaxed)"""
+        values_per_name = {}
+        for statement in statements:
+            values_per_name.setdefault(statement[0], []).append(statement[1:])
+        relations = [self._relation(args, values_per_name.get(name, ())) for name, args in self.pos]
+        order, bindings = list(self.constants), [self.constants]
+        negatives = [] if relaxed else self.neg
+        bindings, negatives = self._check_negatives(order, bindings, negatives, statements)
+        while relations and bindings:
+            bound = set(order)
+            variables, rows = min(relations, key=lambda relation: (
+                len(relation[0]) > 0 and bound.isdisjoint(relation[0]), len(relation[1]), relation[0]
+            ))
+            relations.remove((variables, rows))
+            shared = [i for i, var in enumerate(variables) if var in bound]
+            new = [i for i, var in enumerate(variables) if var not in bound]
+            index = {}  # Values of the shared variables -> values of the new ones
+            for row in rows:
+                index.setdefault(tuple(row[i] for i in shared), []).append(tuple(row[i] for i in new))
+            key_positions = [order.index(variables[i]) for i in shared]
+            bindings = [binding + extension for binding in bindings
+                        for extension in index.get(tuple(binding[i] for i in key_positions), ())]
+            order += [variables[i] for i in new]
+            bindings, negatives = self._check_negatives(order, bindings, negatives, statements)
+        for var, domain in self.neg_domains:
+            if not bindings:
+                break
+            bindings = [binding + (val,) for binding in bindings for val in domain]
+            order.append(var)
+            bindings, negatives = self._check_negatives(order, bindings, negatives, statements)
+        return [frozendict(zip(order, binding)) for binding in sorted(bindings)]